@@ -0,0 +1,252 @@
+"""Local mock of the TAP API routes used by pyproofpoint.
+
+Run it standalone with python benchmarks/mock_server.py --port 8080, or start it in-process with
+MockTAPServer.start().
+"""
+import argparse
+import gzip
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from payloads import PayloadGenerator
+
+SIEM_ROUTES = (
+    "/v2/siem/all",
+    "/v2/siem/issues",
+    "/v2/siem/messages/delivered",
+    "/v2/siem/messages/blocked",
+    "/v2/siem/clicks/permitted",
+    "/v2/siem/clicks/blocked",
+)
+
+
+class MockTAPServer(ThreadingHTTPServer):
+    """Threaded HTTP server answering TAP API routes with synthetic payloads.
+
+    :param port:The port to listen on. 0 picks a free one.
+    :param events:The number of events in every SIEM response.
+    :param campaigns:The number of campaign IDs the campaign ID pages add up to.
+    :param people:The number of users the VAP and top clicker pages add up to.
+    :param latency:Seconds each response is delayed by.
+    :param throttle_rate:The fraction of requests answered with 429.
+    :param error_rate:The fraction of requests answered with 500.
+    :param retry_after:The Retry-After value of 429 responses.
+    :param seed:The random seed of the payloads and the injected failures.
+    :param compress:Gzip the responses of clients that send Accept-Encoding: gzip.
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(
+        self,
+        port=0,
+        events=1000,
+        campaigns=1000,
+        people=5000,
+        latency=0.0,
+        throttle_rate=0.0,
+        error_rate=0.0,
+        retry_after=0,
+        seed=0,
+        compress=True,
+    ):
+        super().__init__(("127.0.0.1", port), MockTAPHandler)
+        self.events = events
+        self.campaigns = campaigns
+        self.people = people
+        self.latency = latency
+        self.throttle_rate = throttle_rate
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+        self.compress = compress
+        self.generator = PayloadGenerator(seed)
+        self.rng = random.Random(seed)
+        self.requests = 0
+        self.bytes_sent = 0
+        self._lock = threading.Lock()
+        self._bodies = {}
+        self._thread = None
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_port}"
+
+    def start(self):
+        """Serve from a background thread and return the base URL."""
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self.url
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def body(self, key, build, compressed=False):
+        """Return the cached encoded body for key, building it on first use.
+
+        :param compressed:Return the body gzipped.
+        """
+        if compressed:
+            with self._lock:
+                body = self._bodies.get((key, "gzip"))
+            if body is None:
+                body = gzip.compress(self.body(key, build), compresslevel=6)
+                with self._lock:
+                    self._bodies[(key, "gzip")] = body
+            return body
+        with self._lock:
+            body = self._bodies.get(key)
+            if body is None:
+                payload = build()
+                if not isinstance(payload, str):
+                    payload = json.dumps(payload)
+                body = self._bodies[key] = payload.encode()
+            return body
+
+    def fault(self):
+        """Return the status of an injected failure for the next request, or None."""
+        with self._lock:
+            self.requests += 1
+            roll = self.rng.random()
+        if roll < self.throttle_rate:
+            return 429
+        if roll < self.throttle_rate + self.error_rate:
+            return 500
+        return None
+
+
+class MockTAPHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out as separate writes, which Nagle's algorithm would hold back for the
+    # client's delayed ACK.
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        if server.latency:
+            time.sleep(server.latency)
+        status = server.fault()
+        if status is not None:
+            headers = {"Retry-After": str(server.retry_after)}
+            return self.respond(status, b"", headers)
+        url = urlsplit(self.path)
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        accepted = self.headers.get("Accept-Encoding", "")
+        self.compressed = server.compress and "gzip" in accepted
+        body = self.route(url.path, query)
+        if body is None:
+            return self.respond(404, b'{"error": "not found"}')
+        headers = {"Content-Encoding": "gzip"} if self.compressed else None
+        self.respond(200, body, headers)
+
+    def body(self, key, build):
+        return self.server.body(key, build, self.compressed)
+
+    def route(self, path, query):
+        server = self.server
+        generator = server.generator
+        if path in SIEM_ROUTES:
+            if query.get("format", "syslog").lower() == "json":
+                return self.body(
+                    ("siem", "json"), lambda: generator.siem(server.events)
+                )
+            return self.body(
+                ("siem", "syslog"),
+                lambda: generator.siem_syslog(server.events),
+            )
+        if path == "/v2/campaign/ids":
+            count = self.page_count(query, server.campaigns, 100)
+            return self.body(
+                ("campaign_ids", count),
+                lambda: {"campaigns": generator.campaign_ids(count)},
+            )
+        if path.startswith("/v2/campaign/"):
+            campaign_id = path.rsplit("/", 1)[-1]
+            return self.body(
+                ("campaign", campaign_id),
+                lambda: generator.campaign(campaign_id),
+            )
+        if path.startswith("/v2/threat/summary/"):
+            threat_id = path.rsplit("/", 1)[-1]
+            return self.body(
+                ("threat", threat_id), lambda: generator.threat(threat_id)
+            )
+        if path == "/v2/forensics":
+            key = query.get("threatId") or query.get("campaignId")
+            if not key:
+                return None
+            return self.body(
+                ("forensics", key), lambda: generator.forensics(key)
+            )
+        if path in ("/v2/people/vap", "/v2/people/top-clickers"):
+            default = 1000 if path.endswith("vap") else 100
+            count = self.page_count(query, server.people, default)
+            total = (
+                "totalVapUsers" if path.endswith("vap") else "totalTopClickers"
+            )
+            return self.body(
+                (path, count),
+                lambda: {
+                    "users": generator.people(count),
+                    total: server.people,
+                    "interval": "2020-04-17T00:00:00Z/2020-05-01T00:00:00Z",
+                },
+            )
+        return None
+
+    @staticmethod
+    def page_count(query, total, default_size):
+        size = int(query.get("size", default_size))
+        page = int(query.get("page", 1))
+        return max(0, min(size, total - (page - 1) * size))
+
+    def respond(self, status, body, headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+        with self.server._lock:
+            self.server.bytes_sent += len(body)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--events", type=int, default=1000)
+    parser.add_argument("--campaigns", type=int, default=1000)
+    parser.add_argument("--people", type=int, default=5000)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--no-gzip", action="store_true")
+    args = parser.parse_args()
+    server = MockTAPServer(
+        port=args.port,
+        events=args.events,
+        campaigns=args.campaigns,
+        people=args.people,
+        latency=args.latency,
+        throttle_rate=args.throttle_rate,
+        error_rate=args.error_rate,
+        compress=not args.no_gzip,
+    )
+    print(f"Serving the mock TAP API on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
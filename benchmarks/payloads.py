@@ -0,0 +1,248 @@
+"""Synthetic TAP API payloads for the benchmarks and the mock server."""
+import hashlib
+import json
+import random
+import uuid
+from datetime import datetime, timedelta, timezone
+
+CLASSIFICATIONS = ("MALWARE", "PHISH", "SPAM", "IMPOSTOR")
+THREAT_TYPES = ("URL", "ATTACHMENT", "MESSAGETEXT")
+MODULES = ("pdr", "sandbox", "spam", "urldefense", "dmarc", "av")
+
+
+class PayloadGenerator(object):
+    """Deterministic generator of realistic TAP responses.
+
+    Events draw their threats from a fixed pool of threat and campaign IDs, so enrichment benchmarks
+    see the repetition real SIEM data has.
+
+    :param seed:The random seed.
+    :param threats:The number of distinct threat IDs.
+    :param campaigns:The number of distinct campaign IDs.
+    """
+
+    def __init__(self, seed=0, threats=200, campaigns=20):
+        self.rng = random.Random(seed)
+        self.start = datetime(2020, 5, 1, 12, tzinfo=timezone.utc)
+        self.campaign_pool = [self._uuid() for _ in range(campaigns)]
+        self.threat_pool = [
+            hashlib.sha256(str(i).encode()).hexdigest() for i in range(threats)
+        ]
+
+    def _uuid(self):
+        return str(uuid.UUID(int=self.rng.getrandbits(128)))
+
+    def _time(self):
+        offset = timedelta(seconds=self.rng.randrange(3600))
+        return (self.start + offset).strftime("%Y-%m-%dT%H:%M:%S.000Z")
+
+    def _address(self):
+        return f"user{self.rng.randrange(5000)}@example.com"
+
+    def _ip(self):
+        return ".".join(str(self.rng.randrange(1, 255)) for _ in range(4))
+
+    def threat_info(self):
+        threat_id = self.rng.choice(self.threat_pool)
+        return {
+            "campaignID": self.rng.choice(self.campaign_pool),
+            "classification": self.rng.choice(CLASSIFICATIONS),
+            "threat": f"http://malicious{self.rng.randrange(1000)}.example/x",
+            "threatID": threat_id,
+            "threatStatus": "active",
+            "threatTime": self._time(),
+            "threatType": self.rng.choice(THREAT_TYPES),
+            "threatUrl": f"https://threatinsight.proofpoint.com/threat/{threat_id}",
+        }
+
+    def message(self):
+        recipient = self._address()
+        return {
+            "GUID": self._uuid(),
+            "QID": f"r2FNwRHF0{self.rng.randrange(10 ** 6)}",
+            "ccAddresses": [],
+            "clusterId": "pharmtech_hosted",
+            "completelyRewritten": True,
+            "fromAddress": [self._address()],
+            "headerFrom": f"Sender <{self._address()}>",
+            "headerReplyTo": None,
+            "impostorScore": 0.0,
+            "malwareScore": self.rng.randrange(101),
+            "messageID": f"<{self._uuid()}@mail.example>",
+            "messageParts": [
+                {
+                    "contentType": "text/plain",
+                    "disposition": "inline",
+                    "filename": "text.txt",
+                    "md5": hashlib.md5(self._uuid().encode()).hexdigest(),
+                    "oContentType": "text/plain",
+                    "sandboxStatus": None,
+                    "sha256": hashlib.sha256(self._uuid().encode()).hexdigest(),
+                }
+            ],
+            "messageSize": self.rng.randrange(1000, 100000),
+            "messageTime": self._time(),
+            "modulesRun": list(self.rng.sample(MODULES, 3)),
+            "phishScore": self.rng.randrange(101),
+            "policyRoutes": ["default_inbound"],
+            "quarantineFolder": "Attachment Defense",
+            "quarantineRule": "module.sandbox.threat",
+            "recipient": [recipient],
+            "replyToAddress": [],
+            "sender": self._address(),
+            "senderIP": self._ip(),
+            "spamScore": self.rng.randrange(101),
+            "subject": f"Invoice {self.rng.randrange(10 ** 6)}",
+            "threatsInfoMap": [
+                self.threat_info() for _ in range(self.rng.randrange(1, 3))
+            ],
+            "toAddresses": [recipient],
+            "xmailer": "Microsoft Outlook 16.0",
+        }
+
+    def click(self):
+        threat = self.threat_info()
+        return {
+            "campaignId": threat["campaignID"],
+            "classification": threat["classification"],
+            "clickIP": self._ip(),
+            "clickTime": self._time(),
+            "GUID": self._uuid(),
+            "id": self._uuid(),
+            "recipient": self._address(),
+            "sender": self._address(),
+            "senderIP": self._ip(),
+            "threatID": threat["threatID"],
+            "threatTime": threat["threatTime"],
+            "threatURL": threat["threatUrl"],
+            "threatStatus": "active",
+            "url": threat["threat"],
+            "userAgent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64)",
+        }
+
+    def siem(self, events=1000):
+        """Return a JSON SIEM response with events spread over the four event arrays."""
+        messages = events * 4 // 5
+        clicks = events - messages
+        return {
+            "queryEndTime": "2020-05-01T13:00:00Z",
+            "messagesDelivered": [self.message() for _ in range(messages // 2)],
+            "messagesBlocked": [
+                self.message() for _ in range(messages - messages // 2)
+            ],
+            "clicksPermitted": [self.click() for _ in range(clicks // 2)],
+            "clicksBlocked": [self.click() for _ in range(clicks - clicks // 2)],
+        }
+
+    def siem_syslog(self, events=1000):
+        """Return a syslog SIEM response as one line per event."""
+        lines = []
+        for key, items in self.siem(events).items():
+            if isinstance(items, list):
+                lines.extend(
+                    f"{item['GUID']} type={key} {json.dumps(item)}"
+                    for item in items
+                )
+        return "\n".join(lines) + "\n"
+
+    def campaign_ids(self, count):
+        return [
+            {"id": self._uuid(), "lastUpdatedAt": self._time()}
+            for _ in range(count)
+        ]
+
+    def people(self, count):
+        return [
+            {
+                "identity": {
+                    "guid": self._uuid(),
+                    "emails": [self._address()],
+                    "name": "Example User",
+                    "department": "Finance",
+                    "location": "HQ",
+                    "title": "Analyst",
+                    "vip": False,
+                },
+                "threatStatistics": {
+                    "attackIndex": self.rng.randrange(5000),
+                    "families": [
+                        {"name": "Unclassified", "score": self.rng.randrange(500)}
+                    ],
+                },
+            }
+            for _ in range(count)
+        ]
+
+    def campaign(self, campaign_id):
+        return {
+            "id": campaign_id,
+            "name": f"Campaign {campaign_id[:8]}",
+            "description": "Synthetic campaign",
+            "startDate": self._time(),
+            "campaignMembers": [
+                {
+                    "id": threat_id,
+                    "threat": f"http://malicious.example/{threat_id[:8]}",
+                    "threatStatus": "active",
+                    "type": "url",
+                    "subType": "url",
+                    "threatTime": self._time(),
+                }
+                for threat_id in self.rng.sample(self.threat_pool, 5)
+            ],
+            "families": [{"id": "unknown", "name": "Unknown"}],
+            "malware": [],
+            "techniques": [],
+            "brands": [],
+            "actors": [],
+        }
+
+    def threat(self, threat_id):
+        return {
+            "id": threat_id,
+            "identifiedAt": self._time(),
+            "name": f"http://malicious.example/{threat_id[:8]}",
+            "type": "url",
+            "category": "phish",
+            "status": "active",
+            "detectionType": "url",
+            "severityScore": self.rng.randrange(1000),
+            "attackSpread": self.rng.randrange(100),
+            "notable": False,
+            "verticals": [],
+            "geographies": [],
+            "associatedCampaignId": self.rng.choice(self.campaign_pool),
+            "actors": [],
+            "families": [],
+            "malware": [],
+            "techniques": [],
+            "brands": [],
+        }
+
+    def forensics(self, threat_id):
+        return {
+            "generated": self._time(),
+            "reports": [
+                {
+                    "id": threat_id,
+                    "name": f"http://malicious.example/{threat_id[:8]}",
+                    "scope": "THREAT",
+                    "type": "url",
+                    "threatStatus": "active",
+                    "forensics": [
+                        {
+                            "type": "url",
+                            "display": "URL fetched",
+                            "engine": "iprep",
+                            "malicious": True,
+                            "time": 0,
+                            "what": {"url": "http://malicious.example"},
+                            "platforms": [
+                                {"name": "Win10", "os": "win", "version": "10"}
+                            ],
+                        }
+                        for _ in range(self.rng.randrange(1, 6))
+                    ],
+                }
+            ],
+        }
@@ -0,0 +1,286 @@
+"""Offline benchmarks of pyproofpoint against the local mock TAP server.
+
+Each benchmark runs in its own process so its peak RSS is measured separately. Results are printed as
+JSON, or written to --output, for comparison between releases:
+
+    python benchmarks/run.py --events 5000 --latency 0.02 --output bench.json
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+from pyproofpoint.metrics import RequestHook  # noqa: E402
+from pyproofpoint.proofpoint import ProofPoint  # noqa: E402
+
+
+class Recorder(RequestHook):
+    """Request hook keeping every latency and event count of a benchmark."""
+
+    def __init__(self):
+        self.latencies = []
+        self.events = 0
+        self.retries = 0
+        self.bytes = 0
+
+    def on_request_end(self, info):
+        self.latencies.append(info.total_time)
+        self.events += info.event_count or 0
+        self.retries += info.retries
+        self.bytes += info.bytes_received
+
+
+def bench_siem_json(pp, args):
+    for _ in range(args.iterations):
+        pp.get_all_events(sinceSeconds=3600, dataformat="JSON")
+    return None
+
+
+def bench_siem_stream(pp, args):
+    for _ in range(args.iterations):
+        for _ in pp.get_all_events(
+            sinceSeconds=3600, dataformat="JSON", stream=True
+        ):
+            pass
+    return None
+
+
+def bench_siem_syslog_stream(pp, args):
+    for _ in range(args.iterations):
+        for _ in pp.get_all_events(sinceSeconds=3600, stream=True):
+            pass
+    return None
+
+
+def bench_siem_sink(pp, args, keep_compressed=False):
+    with open(os.devnull, "wb") as sink:
+        for _ in range(args.iterations):
+            pp.get_all_events(
+                sinceSeconds=3600,
+                dataformat="JSON",
+                sink=sink,
+                keep_compressed=keep_compressed,
+            )
+    return None
+
+
+def bench_siem_sink_compressed(pp, args):
+    return bench_siem_sink(pp, args, keep_compressed=True)
+
+
+def bench_backfill(pp, args):
+    # Every mock response repeats the same GUIDs, so count fetched events, not deduplicated ones.
+    start = datetime(2020, 5, 1, tzinfo=timezone.utc)
+    for _ in pp.backfill(
+        start,
+        start + timedelta(hours=args.backfill_hours),
+        workers=args.workers,
+    ):
+        pass
+    return None
+
+
+def bench_pagination_vap(pp, args):
+    items = 0
+    for _ in range(args.iterations):
+        items += sum(1 for _ in pp.iter_vap(90, prefetch=args.workers))
+    return items
+
+
+def bench_pagination_campaign_ids(pp, args):
+    items = 0
+    for _ in range(args.iterations):
+        items += sum(
+            1
+            for _ in pp.iter_campaign_ids(
+                "2020-05-01T00:00:00Z/2020-05-02T00:00:00Z",
+                prefetch=args.workers,
+            )
+        )
+    return items
+
+
+def bench_enrichment(pp, args):
+    response = pp.get_all_events(sinceSeconds=3600, dataformat="JSON")
+    events = [
+        event
+        for value in response.values()
+        if isinstance(value, list)
+        for event in value
+    ]
+    enriched = 0
+    for _ in range(args.iterations):
+        enriched += sum(
+            1 for _ in pp.enrich_events(events, workers=args.workers)
+        )
+    return enriched
+
+
+BENCHMARKS = {
+    "siem_json": bench_siem_json,
+    "siem_stream": bench_siem_stream,
+    "siem_syslog_stream": bench_siem_syslog_stream,
+    "siem_sink": bench_siem_sink,
+    "siem_sink_compressed": bench_siem_sink_compressed,
+    "backfill": bench_backfill,
+    "pagination_vap": bench_pagination_vap,
+    "pagination_campaign_ids": bench_pagination_campaign_ids,
+    "enrichment": bench_enrichment,
+}
+
+# Benchmarks that copy bodies without parsing them, measured in bytes rather than events.
+BYTE_BENCHMARKS = ("siem_sink", "siem_sink_compressed")
+
+
+def percentile(values, quantile):
+    if not values:
+        return None
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(quantile * (len(values) - 1))))
+    return values[index]
+
+
+def run_child(args):
+    """Run one benchmark in this process and print its result as JSON."""
+    recorder = Recorder()
+    pp = ProofPoint("benchmark", "secret", hooks=[recorder], pool_size=32)
+    pp.base_url = args.url
+    start = time.perf_counter()
+    events = BENCHMARKS[args.child](pp, args)
+    elapsed = time.perf_counter() - start
+    if args.child in BYTE_BENCHMARKS:
+        events = None
+    elif events is None:
+        events = recorder.events
+    requests = len(recorder.latencies)
+    result = {
+        "benchmark": args.child,
+        "seconds": elapsed,
+        "requests": requests,
+        "requests_per_second": requests / elapsed,
+        "events": events,
+        "events_per_second": None if events is None else events / elapsed,
+        "retries": recorder.retries,
+        "bytes_received": recorder.bytes,
+        "bytes_per_second": recorder.bytes / elapsed,
+        "latency_p50": percentile(recorder.latencies, 0.5),
+        "latency_p99": percentile(recorder.latencies, 0.99),
+        # ru_maxrss is in kilobytes on Linux and bytes on macOS.
+        "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        // (1024 if sys.platform == "darwin" else 1),
+    }
+    print(json.dumps(result))
+
+
+def run_all(args):
+    from mock_server import MockTAPServer
+
+    server = MockTAPServer(
+        events=args.events,
+        latency=args.latency,
+        throttle_rate=args.throttle_rate,
+        error_rate=args.error_rate,
+    )
+    url = server.start()
+    names = args.only or list(BENCHMARKS)
+    results = []
+    try:
+        for name in names:
+            command = [
+                sys.executable,
+                os.path.abspath(__file__),
+                "--child",
+                name,
+                "--url",
+                url,
+                "--iterations",
+                str(args.iterations),
+                "--workers",
+                str(args.workers),
+                "--backfill-hours",
+                str(args.backfill_hours),
+            ]
+            output = subprocess.run(
+                command, check=True, stdout=subprocess.PIPE, text=True
+            ).stdout
+            results.append(json.loads(output.strip().splitlines()[-1]))
+            result = results[-1]
+            if result["events_per_second"] is None:
+                rate = f"{result['bytes_per_second'] / 2 ** 20:.1f} MiB/s"
+            else:
+                rate = f"{result['events_per_second']:.1f} events/s"
+            print(
+                f"{name}: {result['requests_per_second']:.1f} req/s, {rate}",
+                file=sys.stderr,
+            )
+    finally:
+        server.stop()
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "events": args.events,
+            "latency": args.latency,
+            "throttle_rate": args.throttle_rate,
+            "error_rate": args.error_rate,
+            "iterations": args.iterations,
+            "workers": args.workers,
+            "backfill_hours": args.backfill_hours,
+        },
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as fh:
+            fh.write(text + "\n")
+    else:
+        print(text)
+
+
+def positive_int(value):
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {value}")
+    return number
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--events", type=int, default=2000)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--iterations", type=positive_int, default=10)
+    parser.add_argument("--workers", type=positive_int, default=4)
+    parser.add_argument(
+        "--backfill-hours",
+        type=positive_int,
+        default=10,
+        help="length of the backfill benchmark's window, one request per hour",
+    )
+    parser.add_argument(
+        "--only", action="append", choices=sorted(BENCHMARKS)
+    )
+    parser.add_argument("--output")
+    parser.add_argument("--child", choices=sorted(BENCHMARKS), help=argparse.SUPPRESS)
+    parser.add_argument("--url", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        run_child(args)
+    else:
+        run_all(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,352 @@
+import asyncio
+import inspect
+import time
+
+try:
+    import aiohttp
+except ImportError:  # pragma: no cover - optional dependency
+    aiohttp = None
+
+from .proofpoint import (
+    RETRY_STATUSES,
+    BaseProofPoint,
+    endpoint_family,
+    prepare_params,
+)
+from .stream import STREAM_CHUNK_SIZE, EventStream, make_parser
+
+# Result of an in-flight cached load whose task was cancelled.
+_ABANDONED = object()
+
+
+class AsyncProofPoint(BaseProofPoint):
+    """Asyncio ProofPoint Threat Insights API Class.
+
+    Every get_* method of ProofPoint is available and returns a coroutine. All requests share one
+    aiohttp connection pool, and at most max_concurrency of them are in flight at once. With stream=True,
+    the SIEM methods resolve to an async generator of events.
+    Accepts the BaseProofPoint arguments, plus:
+
+    :param pool_size:The maximum number of connections kept in the pool.
+    :param max_concurrency:The maximum number of requests in flight at once.
+    :param keep_alive:When False, connections are closed after every request.
+    """
+
+    def __init__(
+        self,
+        servicePrincipal,
+        APISecret,
+        timeout=60,
+        pool_size=100,
+        max_concurrency=20,
+        keep_alive=True,
+        max_retries=3,
+        backoff_factor=0.5,
+        max_backoff=60,
+        cache=None,
+        rate_limiter=None,
+        hooks=None,
+        json_loads=None,
+    ):
+        if aiohttp is None:
+            raise ImportError(
+                "AsyncProofPoint requires aiohttp, install it with"
+                " pip install pyproofpoint[async]"
+            )
+        super().__init__(
+            servicePrincipal,
+            APISecret,
+            timeout=timeout,
+            max_retries=max_retries,
+            backoff_factor=backoff_factor,
+            max_backoff=max_backoff,
+            cache=cache,
+            rate_limiter=rate_limiter,
+            hooks=hooks,
+            json_loads=json_loads,
+        )
+        self.pool_size = pool_size
+        self.keep_alive = keep_alive
+        self.max_concurrency = max_concurrency
+        self.semaphore = None
+        self.session = None
+        self.raw_session = None
+        self._inflight = {}
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        """Close the pooled connections held by the client."""
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+        if self.raw_session is not None:
+            await self.raw_session.close()
+            self.raw_session = None
+        self.semaphore = None
+
+    def get_session(self, raw=False):
+        """Return the shared aiohttp session, creating it on first use.
+
+        :param raw:Return the session that leaves compressed bodies as received, used for sinks.
+        """
+        session = self.raw_session if raw else self.session
+        if session is None or session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.pool_size, force_close=not self.keep_alive
+            )
+            session = aiohttp.ClientSession(
+                connector=connector,
+                auth=aiohttp.BasicAuth(*self.auth),
+                auto_decompress=not raw,
+            )
+            if raw:
+                self.raw_session = session
+            else:
+                self.session = session
+        return session
+
+    def get_semaphore(self):
+        """Return the semaphore bounding requests in flight, creating it on first use.
+
+        It is created inside the running event loop, since on Python < 3.10 an asyncio.Semaphore binds to
+        the loop current at construction.
+        """
+        if self.semaphore is None:
+            self.semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self.semaphore
+
+    def get_client_timeout(self, uri):
+        """Return the aiohttp timeout configured for the endpoint family of uri."""
+        timeout = self.get_timeout(uri)
+        if isinstance(timeout, tuple):
+            connect, read = timeout
+            return aiohttp.ClientTimeout(sock_connect=connect, sock_read=read)
+        return aiohttp.ClientTimeout(total=timeout)
+
+    async def send_request(
+        self,
+        uri,
+        params=None,
+        stream=False,
+        cache=False,
+        sink=None,
+        keep_compressed=False,
+    ):
+        if sink is not None:
+            return await self.copy_response(uri, params, sink, keep_compressed)
+        if stream:
+            parser = make_parser((params or {}).get("format"))
+            return EventStream(self.iter_response(uri, params, parser), parser)
+        family = endpoint_family(uri)
+        if cache and self.cache is not None and self.cache.caches(family):
+            return await self.get_cached(family, uri, params)
+        return await self.fetch_json(uri, params)
+
+    async def get_cached(self, family, uri, params=None):
+        """Return a cached response, coalescing concurrent loads of the same request.
+
+        When the task loading a response is cancelled, one of the tasks waiting on it takes over the load.
+        """
+        key = self.cache_key(uri, params)
+        counted = False
+        while True:
+            found, value = self.cache.peek(key)
+            if found:
+                if not counted:
+                    self.cache.count("hits")
+                return value
+            future = self._inflight.get(key)
+            if future is None:
+                break
+            if not counted:
+                self.cache.count("coalesced")
+                counted = True
+            value = await asyncio.shield(future)
+            if value is not _ABANDONED:
+                return value
+        if not counted:
+            self.cache.count("misses")
+        future = self._inflight[key] = asyncio.get_running_loop().create_future()
+        try:
+            value = await self.fetch_json(uri, params)
+        except asyncio.CancelledError:
+            # Wake the waiting tasks so the first of them retries the load.
+            future.set_result(_ABANDONED)
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark the exception retrieved when nobody else awaited it.
+            future.exception()
+            raise
+        else:
+            self.cache.store(family, key, value)
+            future.set_result(value)
+            return value
+        finally:
+            del self._inflight[key]
+
+    async def fetch_json(self, uri, params=None):
+        """Perform a GET with retries and return the decoded JSON response."""
+        info = self.start_request(uri, params) if self.hooks else None
+        try:
+            async with self.get_semaphore():
+                r = await self.get_response(uri, params=params, info=info)
+                status = None
+                try:
+                    body = await r.read()
+                    status = r.status
+                    if info is None:
+                        return self.json_loads(body)
+                    info.bytes_received = len(body)
+                    decode_start = time.perf_counter()
+                    data = self.json_loads(body)
+                    info.decode_time = time.perf_counter() - decode_start
+                    info.count_events(data)
+                finally:
+                    r.release()
+                    self.release_response(uri, status)
+        except Exception as e:
+            if info is not None:
+                self.end_request(info, e)
+            raise
+        self.end_request(info)
+        return data
+
+    async def copy_response(self, uri, params, sink, keep_compressed=False):
+        """Copy the raw body of a gzip-encoded GET into sink and return its size and encoding.
+
+        sink.write may be a plain function or a coroutine function.
+        """
+        info = self.start_request(uri, params) if self.hooks else None
+        written = 0
+        try:
+            async with self.get_semaphore():
+                r = await self.get_response(
+                    uri,
+                    params=params,
+                    info=info,
+                    headers={"Accept-Encoding": "gzip"},
+                    raw=keep_compressed,
+                )
+                status = None
+                try:
+                    async for chunk in r.content.iter_chunked(
+                        STREAM_CHUNK_SIZE
+                    ):
+                        result = sink.write(chunk)
+                        if inspect.isawaitable(result):
+                            await result
+                        written += len(chunk)
+                    status = r.status
+                finally:
+                    r.release()
+                    self.release_response(uri, status)
+        except Exception as e:
+            if info is not None:
+                info.bytes_received = written
+                self.end_request(info, e)
+            raise
+        if info is not None:
+            info.bytes_received = written
+            self.end_request(info)
+        encoding = None
+        if keep_compressed:
+            encoding = r.headers.get("Content-Encoding")
+        return {"bytes": written, "encoding": encoding}
+
+    async def iter_response(self, uri, params, parser):
+        """Yield the events of a streamed SIEM response as it downloads, parsed by parser."""
+        info = self.start_request(uri, params) if self.hooks else None
+        error = None
+        try:
+            async with self.get_semaphore():
+                r = await self.get_response(uri, params=params, info=info)
+                status = None
+                try:
+                    async for chunk in r.content.iter_chunked(
+                        STREAM_CHUNK_SIZE
+                    ):
+                        events = parser.feed(chunk)
+                        if info is not None:
+                            info.bytes_received += len(chunk)
+                            info.event_count = (info.event_count or 0) + len(
+                                events
+                            )
+                        for event in events:
+                            yield event
+                    for event in parser.close():
+                        yield event
+                    status = r.status
+                finally:
+                    r.release()
+                    self.release_response(uri, status)
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            if info is not None:
+                self.end_request(info, error)
+
+    async def get_response(
+        self, uri, params=None, info=None, headers=None, raw=False
+    ):
+        """Perform a GET with retries and return the successful, unread response.
+
+        The rate limiter slot of the request stays held until release_response is called once the body
+        has been read.
+
+        :param info:An optional RequestInfo updated with the status, retries and time to first byte.
+        :param headers:Optional extra request headers.
+        :param raw:Use the session that does not decompress response bodies.
+        """
+        url = self.base_url + uri
+        params = prepare_params(params)
+        timeout = self.get_client_timeout(uri)
+        session = self.get_session(raw=raw)
+        family = endpoint_family(uri)
+        limiter = self.rate_limiter
+        attempt = 0
+        while True:
+            if limiter is not None:
+                await limiter.acquire_async(family)
+            attempt_start = time.perf_counter()
+            status = retry_after = None
+            held = False
+            try:
+                r = await session.get(
+                    url, params=params, timeout=timeout, headers=headers
+                )
+                status = r.status
+                retry_after = r.headers.get("Retry-After")
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                if attempt >= self.max_retries:
+                    raise
+                delay = self.retry_delay(attempt)
+            else:
+                if info is not None:
+                    info.status = r.status
+                    info.retries = attempt
+                    info.ttfb = time.perf_counter() - attempt_start
+                if (
+                    r.status not in RETRY_STATUSES
+                    or attempt >= self.max_retries
+                ):
+                    if r.status >= 400:
+                        r.release()
+                        r.raise_for_status()
+                    held = True
+                    return r
+                delay = self.retry_delay(attempt, retry_after)
+                r.release()
+            finally:
+                # Every acquired slot is given back, including when the task is cancelled, unless the
+                # caller still has a body to read.
+                if limiter is not None and not held:
+                    limiter.release(family, status, retry_after)
+            await asyncio.sleep(delay)
+            attempt += 1
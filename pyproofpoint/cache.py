@@ -0,0 +1,204 @@
+import collections
+import json
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+
+# Seconds a response stays fresh, per endpoint family. Families without an entry are never cached.
+DEFAULT_TTLS = {"threat": 3600, "campaign": 3600, "forensics": 3600}
+
+
+class LRUCache(object):
+    """Thread-safe in-memory LRU mapping with a per-entry expiry time.
+
+    :param maxsize:The maximum number of entries before the least recently used one is evicted.
+    """
+
+    def __init__(self, maxsize=10000):
+        self.maxsize = maxsize
+        self.evictions = 0
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """Return (found, value) for key, dropping the entry if it has expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None
+            expires, value = entry
+            if expires <= time.time():
+                del self._entries[key]
+                return False, None
+            self._entries.move_to_end(key)
+            return True, value
+
+    def set(self, key, value, expires):
+        """Store value under key until the expires timestamp."""
+        with self._lock:
+            self._entries[key] = (expires, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class SQLiteCache(object):
+    """Persistent cache tier storing JSON responses in a SQLite database.
+
+    :param path:The path of the database file, created if missing.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        with self._db:
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses"
+                " (key TEXT PRIMARY KEY, value TEXT, expires REAL)"
+            )
+
+    def get(self, key):
+        """Return (found, value, expires) for key, ignoring expired rows."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT value, expires FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None or row[1] <= time.time():
+            return False, None, None
+        return True, json.loads(row[0]), row[1]
+
+    def set(self, key, value, expires):
+        """Store value under key until the expires timestamp."""
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?)",
+                (key, json.dumps(value), expires),
+            )
+
+    def purge(self):
+        """Delete expired rows."""
+        with self._lock, self._db:
+            self._db.execute(
+                "DELETE FROM responses WHERE expires <= ?", (time.time(),)
+            )
+
+    def close(self):
+        self._db.close()
+
+
+class ResponseCache(object):
+    """Opt-in response cache for the ProofPoint clients.
+
+    Lookups check an in-memory LRU first and then, when path is given, a SQLite file so a restarted
+    process starts warm. Concurrent loads of the same key are coalesced into one request.
+
+    :param maxsize:The maximum number of responses kept in memory.
+    :param ttls:A dict of seconds a response stays fresh, keyed by endpoint family. Defaults to DEFAULT_TTLS.
+    :param path:An optional SQLite database path for the persistent tier.
+    """
+
+    def __init__(self, maxsize=10000, ttls=None, path=None):
+        self.ttls = dict(DEFAULT_TTLS if ttls is None else ttls)
+        self.memory = LRUCache(maxsize)
+        self.disk = SQLiteCache(path) if path else None
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    @property
+    def stats(self):
+        """Return the hit, miss, eviction and coalesced request counters."""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.memory.evictions,
+            "coalesced": self.coalesced,
+            "size": len(self.memory),
+        }
+
+    def caches(self, family):
+        """Return True if responses of the endpoint family are cached."""
+        return bool(self.ttls.get(family))
+
+    def lookup(self, key):
+        """Return (found, value) for key from memory or disk, counting a hit or a miss."""
+        found, value = self.peek(key)
+        self.count("hits" if found else "misses")
+        return found, value
+
+    def peek(self, key):
+        """Return (found, value) for key from memory or disk without counting it."""
+        found, value = self.memory.get(key)
+        if not found and self.disk is not None:
+            found, value, expires = self.disk.get(key)
+            if found:
+                self.memory.set(key, value, expires)
+        return found, value
+
+    def count(self, counter):
+        """Add one to the hits, misses or coalesced counter."""
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def store(self, family, key, value):
+        """Store a freshly fetched response under key for the TTL of its family."""
+        expires = time.time() + self.ttls[family]
+        self.memory.set(key, value, expires)
+        if self.disk is not None:
+            self.disk.set(key, value, expires)
+
+    def get_or_load(self, family, key, load):
+        """Return the cached response for key, calling load once to fetch it on a miss."""
+        if not self.caches(family):
+            return load()
+        found, value = self.peek(key)
+        if found:
+            self.count("hits")
+            return value
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                # A leader may have stored the response since the lookup above.
+                found, value = self.memory.get(key)
+                if found:
+                    self.hits += 1
+                    return value
+                future = self._inflight[key] = Future()
+                self.misses += 1
+            else:
+                self.coalesced += 1
+        if not leader:
+            return future.result()
+        try:
+            value = load()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            self.store(family, key, value)
+            future.set_result(value)
+            return value
+        finally:
+            with self._lock:
+                del self._inflight[key]
+
+    def clear(self):
+        """Empty the in-memory tier."""
+        self.memory.clear()
+
+    def close(self):
+        if self.disk is not None:
+            self.disk.close()
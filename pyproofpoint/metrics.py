@@ -0,0 +1,216 @@
+import threading
+import time
+
+from .stream import SIEM_EVENT_KEYS
+
+# Upper bounds, in seconds, of the latency histogram buckets.
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, float("inf"))
+
+
+def path_template(uri):
+    """Return uri with its lookup IDs replaced by placeholders, e.g. /v2/campaign/{campaignId}."""
+    if uri.startswith("/v2/campaign/") and uri != "/v2/campaign/ids":
+        return "/v2/campaign/{campaignId}"
+    if uri.startswith("/v2/threat/summary/"):
+        return "/v2/threat/summary/{threatId}"
+    return uri
+
+
+class RequestInfo(object):
+    """Measurements of one API call, passed to the request hooks of a client.
+
+    Times are in seconds. ttfb is measured for the final attempt, total_time covers every attempt plus
+    reading and decoding the body. event_count is set for JSON SIEM responses.
+    """
+
+    __slots__ = (
+        "family",
+        "path",
+        "uri",
+        "params",
+        "status",
+        "bytes_received",
+        "ttfb",
+        "total_time",
+        "decode_time",
+        "retries",
+        "event_count",
+        "error",
+        "started",
+    )
+
+    def __init__(self, family, uri, params=None):
+        self.family = family
+        self.path = path_template(uri)
+        self.uri = uri
+        self.params = params
+        self.status = None
+        self.bytes_received = 0
+        self.ttfb = None
+        self.total_time = None
+        self.decode_time = None
+        self.retries = 0
+        self.event_count = None
+        self.error = None
+        self.started = time.perf_counter()
+
+    def count_events(self, data):
+        """Set event_count from a decoded SIEM response."""
+        if self.family == "siem" and isinstance(data, dict):
+            self.event_count = sum(
+                len(data.get(key) or ()) for key in SIEM_EVENT_KEYS
+            )
+
+    def finish(self, error=None):
+        self.total_time = time.perf_counter() - self.started
+        self.error = error
+
+
+class RequestHook(object):
+    """Base class of request hooks. Subclasses override the callbacks they need."""
+
+    def on_request_start(self, info):
+        pass
+
+    def on_request_end(self, info):
+        pass
+
+
+class _EndpointStats(object):
+    __slots__ = (
+        "buckets",
+        "count",
+        "latency_sum",
+        "ttfb_sum",
+        "decode_sum",
+        "bytes",
+        "retries",
+        "events",
+        "errors",
+        "statuses",
+    )
+
+    def __init__(self):
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+        self.count = 0
+        self.latency_sum = 0.0
+        self.ttfb_sum = 0.0
+        self.decode_sum = 0.0
+        self.bytes = 0
+        self.retries = 0
+        self.events = 0
+        self.errors = 0
+        self.statuses = {}
+
+
+class MetricsAggregator(RequestHook):
+    """In-process request hook keeping latency histograms and totals per endpoint path."""
+
+    def __init__(self):
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def on_request_end(self, info):
+        key = (info.family, info.path)
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                stats = self._stats[key] = _EndpointStats()
+            for index, bound in enumerate(LATENCY_BUCKETS):
+                if info.total_time <= bound:
+                    stats.buckets[index] += 1
+                    break
+            stats.count += 1
+            stats.latency_sum += info.total_time
+            stats.ttfb_sum += info.ttfb or 0.0
+            stats.decode_sum += info.decode_time or 0.0
+            stats.bytes += info.bytes_received
+            stats.retries += info.retries
+            stats.events += info.event_count or 0
+            if info.error is not None:
+                stats.errors += 1
+            if info.status is not None:
+                stats.statuses[info.status] = (
+                    stats.statuses.get(info.status, 0) + 1
+                )
+
+    def percentile(self, family, path, quantile):
+        """Estimate a latency quantile (0-1) of an endpoint as the upper bound of its histogram bucket."""
+        with self._lock:
+            stats = self._stats.get((family, path))
+            if stats is None or not stats.count:
+                return None
+            target = quantile * stats.count
+            seen = 0
+            for bound, count in zip(LATENCY_BUCKETS, stats.buckets):
+                seen += count
+                if seen >= target:
+                    return bound
+        return LATENCY_BUCKETS[-1]
+
+    def snapshot(self):
+        """Return the aggregated metrics as a dict keyed by (family, path)."""
+        with self._lock:
+            return {
+                key: {
+                    "count": stats.count,
+                    "latency_sum": stats.latency_sum,
+                    "latency_buckets": dict(zip(LATENCY_BUCKETS, stats.buckets)),
+                    "ttfb_sum": stats.ttfb_sum,
+                    "decode_sum": stats.decode_sum,
+                    "bytes": stats.bytes,
+                    "retries": stats.retries,
+                    "events": stats.events,
+                    "errors": stats.errors,
+                    "statuses": dict(stats.statuses),
+                }
+                for key, stats in self._stats.items()
+            }
+
+    def render_prometheus(self, prefix="pyproofpoint"):
+        """Return the metrics in the Prometheus text exposition format."""
+        snapshot = self.snapshot()
+        lines = [
+            f"# TYPE {prefix}_request_duration_seconds histogram",
+        ]
+        for (family, path), stats in sorted(snapshot.items()):
+            labels = f'family="{family}",path="{path}"'
+            cumulative = 0
+            for bound, count in stats["latency_buckets"].items():
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(float(bound))
+                lines.append(
+                    f"{prefix}_request_duration_seconds_bucket"
+                    f'{{{labels},le="{le}"}} {cumulative}'
+                )
+            lines.append(
+                f"{prefix}_request_duration_seconds_sum{{{labels}}}"
+                f" {stats['latency_sum']}"
+            )
+            lines.append(
+                f"{prefix}_request_duration_seconds_count{{{labels}}}"
+                f" {stats['count']}"
+            )
+        counters = (
+            ("ttfb_seconds_total", "ttfb_sum"),
+            ("decode_seconds_total", "decode_sum"),
+            ("received_bytes_total", "bytes"),
+            ("retries_total", "retries"),
+            ("events_total", "events"),
+            ("errors_total", "errors"),
+        )
+        for name, field in counters:
+            lines.append(f"# TYPE {prefix}_{name} counter")
+            for (family, path), stats in sorted(snapshot.items()):
+                lines.append(
+                    f'{prefix}_{name}{{family="{family}",path="{path}"}}'
+                    f" {stats[field]}"
+                )
+        lines.append(f"# TYPE {prefix}_responses_total counter")
+        for (family, path), stats in sorted(snapshot.items()):
+            for status, count in sorted(stats["statuses"].items()):
+                lines.append(
+                    f'{prefix}_responses_total{{family="{family}",'
+                    f'path="{path}",status="{status}"}} {count}'
+                )
+        return "\n".join(lines) + "\n"
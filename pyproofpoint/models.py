@@ -0,0 +1,308 @@
+import csv
+import itertools
+import json
+import sys
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:  # pragma: no cover - optional dependency
+    pyarrow = None
+
+from .stream import SIEM_EVENT_KEYS
+
+# Field kinds. Symbols are strings repeated across events, which get interned. Strings lists are
+# interned element-wise, and JSON values are kept as compact JSON text.
+STRING = "string"
+SYMBOL = "symbol"
+INTEGER = "integer"
+FLOAT = "float"
+BOOLEAN = "boolean"
+STRINGS = "strings"
+JSON = "json"
+THREATS = "threats"
+
+
+class Record(object):
+    """Base class of the compact SIEM records.
+
+    Subclasses list their (name, kind) pairs in fields and store them in __slots__, so a record holds
+    no per-instance dict. Repeated values such as classifications and threat IDs are interned, lists
+    become tuples and free-form nested values become JSON text.
+    """
+
+    __slots__ = ()
+    fields = ()
+
+    def __init__(self, **values):
+        for name, kind in self.fields:
+            setattr(self, name, _convert(kind, values.get(name)))
+
+    def __repr__(self):
+        return f"{type(self).__name__}(GUID={getattr(self, 'GUID', None)!r})"
+
+    def __eq__(self, other):
+        return type(self) is type(other) and all(
+            getattr(self, name) == getattr(other, name)
+            for name, _ in self.fields
+        )
+
+    @classmethod
+    def from_dict(cls, data, **extra):
+        """Build a record from an API dict, ignoring unknown keys."""
+        record = cls.__new__(cls)
+        for name, kind in cls.fields:
+            value = extra[name] if name in extra else data.get(name)
+            setattr(record, name, _convert(kind, value))
+        return record
+
+    def to_dict(self):
+        """Return the record as a plain dict in the shape the API uses."""
+        data = {}
+        for name, kind in self.fields:
+            value = getattr(self, name)
+            if kind == THREATS and value is not None:
+                value = [threat.to_dict() for threat in value]
+            elif kind == STRINGS and value is not None:
+                value = list(value)
+            elif kind == JSON and value is not None:
+                value = json.loads(value)
+            data[name] = value
+        return data
+
+
+class ThreatInfo(Record):
+    """An entry of the threatsInfoMap of a message event."""
+
+    fields = (
+        ("campaignID", SYMBOL),
+        ("classification", SYMBOL),
+        ("threat", SYMBOL),
+        ("threatID", SYMBOL),
+        ("threatStatus", SYMBOL),
+        ("threatTime", STRING),
+        ("threatType", SYMBOL),
+        ("threatUrl", SYMBOL),
+    )
+    __slots__ = tuple(name for name, _ in fields)
+
+
+class MessageEvent(Record):
+    """A messagesDelivered or messagesBlocked SIEM event. eventType names the array it came from."""
+
+    fields = (
+        ("eventType", SYMBOL),
+        ("GUID", STRING),
+        ("QID", STRING),
+        ("ccAddresses", STRINGS),
+        ("clusterId", SYMBOL),
+        ("completelyRewritten", BOOLEAN),
+        ("fromAddress", STRINGS),
+        ("headerFrom", SYMBOL),
+        ("headerReplyTo", STRING),
+        ("impostorScore", FLOAT),
+        ("malwareScore", FLOAT),
+        ("messageID", STRING),
+        ("messageParts", JSON),
+        ("messageSize", INTEGER),
+        ("messageTime", STRING),
+        ("modulesRun", STRINGS),
+        ("phishScore", FLOAT),
+        ("policyRoutes", STRINGS),
+        ("quarantineFolder", SYMBOL),
+        ("quarantineRule", SYMBOL),
+        ("recipient", STRINGS),
+        ("replyToAddress", STRINGS),
+        ("sender", SYMBOL),
+        ("senderIP", SYMBOL),
+        ("spamScore", FLOAT),
+        ("subject", STRING),
+        ("threatsInfoMap", THREATS),
+        ("toAddresses", STRINGS),
+        ("xmailer", SYMBOL),
+    )
+    __slots__ = tuple(name for name, _ in fields)
+
+
+class ClickEvent(Record):
+    """A clicksPermitted or clicksBlocked SIEM event. eventType names the array it came from."""
+
+    fields = (
+        ("eventType", SYMBOL),
+        ("GUID", STRING),
+        ("id", STRING),
+        ("campaignId", SYMBOL),
+        ("classification", SYMBOL),
+        ("clickIP", SYMBOL),
+        ("clickTime", STRING),
+        ("recipient", SYMBOL),
+        ("sender", SYMBOL),
+        ("senderIP", SYMBOL),
+        ("threatID", SYMBOL),
+        ("threatStatus", SYMBOL),
+        ("threatTime", STRING),
+        ("threatURL", SYMBOL),
+        ("url", STRING),
+        ("userAgent", SYMBOL),
+    )
+    __slots__ = tuple(name for name, _ in fields)
+
+
+def _convert(kind, value):
+    if value is None:
+        return None
+    if kind == SYMBOL:
+        return sys.intern(str(value))
+    if kind == STRINGS:
+        if not isinstance(value, (list, tuple)):
+            value = [value]
+        return tuple(sys.intern(str(item)) for item in value)
+    if kind == JSON:
+        return json.dumps(value, separators=(",", ":"))
+    if kind == THREATS:
+        return tuple(
+            threat
+            if isinstance(threat, ThreatInfo)
+            else ThreatInfo.from_dict(threat)
+            for threat in value
+        )
+    return value
+
+
+def event_record(key, event):
+    """Build the record for an event of the SIEM array key, e.g. a (key, event) pair from a stream."""
+    cls = MessageEvent if key.startswith("messages") else ClickEvent
+    return cls.from_dict(event, eventType=key)
+
+
+def iter_records(response):
+    """Yield a record for every event of a JSON SIEM response, such as one from get_all_events."""
+    for key in SIEM_EVENT_KEYS:
+        for event in response.get(key) or ():
+            yield event_record(key, event)
+
+
+def from_siem_response(response):
+    """Convert a JSON SIEM response into a dict with "messages" and "clicks" record lists."""
+    converted = {"messages": [], "clicks": []}
+    for record in iter_records(response):
+        if isinstance(record, MessageEvent):
+            converted["messages"].append(record)
+        else:
+            converted["clicks"].append(record)
+    return converted
+
+
+def _export_value(kind, value, textual):
+    """Return a record value as stored in an exported column."""
+    if value is None:
+        return None
+    if kind == THREATS:
+        return json.dumps([threat.to_dict() for threat in value])
+    if kind == JSON:
+        return value
+    if kind == STRINGS and textual:
+        return json.dumps(value)
+    if kind == STRINGS:
+        return list(value)
+    return value
+
+
+def _arrow_schema(cls):
+    types = {
+        STRING: pyarrow.string(),
+        SYMBOL: pyarrow.string(),
+        INTEGER: pyarrow.int64(),
+        FLOAT: pyarrow.float64(),
+        BOOLEAN: pyarrow.bool_(),
+        STRINGS: pyarrow.list_(pyarrow.string()),
+        JSON: pyarrow.string(),
+        THREATS: pyarrow.string(),
+    }
+    return pyarrow.schema(
+        [(name, types[kind]) for name, kind in cls.fields]
+    )
+
+
+def export_records(records, path, dataformat=None, chunk_size=10000):
+    """Write records of one class to a columnar file, chunk_size records at a time.
+
+    Parquet and Arrow IPC files need pyarrow. CSV is written with the standard library; its list and
+    nested columns hold JSON text, as do the threatsInfoMap and messageParts columns of every format.
+
+    :param records:An iterable of MessageEvent, ClickEvent or ThreatInfo records, all of the same class.
+    :param path:The file to write.
+    :param dataformat:One of parquet, arrow or csv. Defaults to the extension of path.
+    :param chunk_size:The number of records converted to columns at once.
+    :return:The number of records written.
+    """
+    if dataformat is None:
+        dataformat = path.rsplit(".", 1)[-1]
+    dataformat = dataformat.lower()
+    if dataformat == "feather":
+        dataformat = "arrow"
+    if dataformat not in ("parquet", "arrow", "csv"):
+        raise ValueError(f"Unsupported export format: {dataformat}")
+    if dataformat != "csv" and pyarrow is None:
+        raise ImportError(
+            f"Exporting {dataformat} requires pyarrow, install it with"
+            " pip install pyproofpoint[export] or export to csv"
+        )
+    records = iter(records)
+    chunk = list(itertools.islice(records, chunk_size))
+    if not chunk:
+        return 0
+    cls = type(chunk[0])
+    textual = dataformat == "csv"
+    written = 0
+    with _ColumnWriter(dataformat, path, cls) as write:
+        while chunk:
+            columns = {
+                name: [
+                    _export_value(kind, getattr(record, name), textual)
+                    for record in chunk
+                ]
+                for name, kind in cls.fields
+            }
+            write(columns, len(chunk))
+            written += len(chunk)
+            chunk = list(itertools.islice(records, chunk_size))
+    return written
+
+
+class _ColumnWriter(object):
+    """Context manager returning a write(columns, rows) callable for an export format."""
+
+    def __init__(self, dataformat, path, cls):
+        self.dataformat = dataformat
+        self.path = path
+        self.cls = cls
+        self.sink = None
+
+    def __enter__(self):
+        names = [name for name, _ in self.cls.fields]
+        if self.dataformat == "csv":
+            self.sink = open(self.path, "w", newline="", encoding="utf-8")
+            writer = csv.writer(self.sink)
+            writer.writerow(names)
+
+            def write(columns, rows):
+                writer.writerows(zip(*(columns[name] for name in names)))
+
+            return write
+        schema = _arrow_schema(self.cls)
+        if self.dataformat == "parquet":
+            self.sink = pyarrow.parquet.ParquetWriter(self.path, schema)
+        else:
+            self.sink = pyarrow.ipc.new_file(self.path, schema)
+
+        def write(columns, rows):
+            self.sink.write_table(
+                pyarrow.Table.from_pydict(columns, schema=schema)
+            )
+
+        return write
+
+    def __exit__(self, *exc_info):
+        self.sink.close()
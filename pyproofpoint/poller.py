@@ -0,0 +1,203 @@
+import json
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+from .proofpoint import (
+    MAX_SIEM_WINDOW,
+    SIEM_EVENT_KEYS,
+    format_datetime,
+    parse_datetime,
+)
+
+# Lag beyond which the poller switches from sinceTime polling to interval backfills.
+CATCH_UP_LAG = MAX_SIEM_WINDOW - timedelta(minutes=5)
+
+
+def event_time(event):
+    """Return the messageTime or clickTime of a SIEM event as a POSIX timestamp, or None."""
+    value = event.get("messageTime") or event.get("clickTime")
+    if not value:
+        return None
+    try:
+        return parse_datetime(value).timestamp()
+    except ValueError:
+        return None
+
+
+class Checkpoint(object):
+    """Poller cursor persisted as a small JSON file, replaced atomically on every save.
+
+    :param path:The path of the checkpoint file.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def load(self):
+        """Return the saved cursor as a datetime, or None if nothing was saved yet."""
+        try:
+            with open(self.path, "r", encoding="utf-8") as fh:
+                return parse_datetime(json.load(fh)["cursor"])
+        except FileNotFoundError:
+            return None
+
+    def save(self, cursor):
+        """Write the cursor to a temporary file and move it over the checkpoint."""
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp = tempfile.mkstemp(dir=directory, prefix=".checkpoint-")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as fh:
+                json.dump({"cursor": format_datetime(cursor)}, fh)
+                fh.flush()
+                os.fsync(fh.fileno())
+            os.replace(tmp, self.path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+
+class RecentGUIDs(object):
+    """Set of GUIDs seen recently, bucketed by event time so memory stays bounded.
+
+    GUIDs expire once the newest event time seen is retention past their own, so a catch-up backfill
+    only keeps the GUIDs near its end, where the next window can overlap it.
+
+    :param retention:A timedelta after which a GUID is forgotten.
+    :param bucket:A timedelta giving the granularity at which GUIDs expire.
+    """
+
+    def __init__(
+        self, retention=timedelta(hours=2), bucket=timedelta(minutes=5)
+    ):
+        self.retention = retention.total_seconds()
+        self.bucket = bucket.total_seconds()
+        self.latest = None
+        self._buckets = {}
+
+    def __len__(self):
+        return sum(len(guids) for guids in self._buckets.values())
+
+    def __contains__(self, guid):
+        return any(guid in guids for guids in self._buckets.values())
+
+    def add(self, guid, when=None):
+        """Remember guid, returning False if it was already seen.
+
+        :param when:The event time as a POSIX timestamp. Defaults to the newest time seen, or now.
+        """
+        if when is None:
+            when = time.time() if self.latest is None else self.latest
+        if self.latest is None or when > self.latest:
+            self.latest = when
+            self._expire()
+        if guid in self:
+            return False
+        start = when - when % self.bucket
+        if start + self.bucket > self.latest - self.retention:
+            self._buckets.setdefault(start, set()).add(guid)
+        return True
+
+    def _expire(self):
+        horizon = self.latest - self.retention
+        for start in [s for s in self._buckets if s + self.bucket <= horizon]:
+            del self._buckets[start]
+
+
+class SIEMPoller(object):
+    """Continuous SIEM collector that resumes from a checkpoint file.
+
+    Each poll asks for everything since the saved cursor and yields (key, event) pairs, where key names
+    the array the event came from. The cursor is saved once every event of a batch has been consumed,
+    so a crash replays at most the batch in progress. When the cursor lags more than the API allows for
+    sinceTime, the gap is fetched as parallel one-hour intervals through ProofPoint.backfill.
+
+    :param client:A ProofPoint instance.
+    :param checkpoint_path:The path of the checkpoint file.
+    :param method:The name of the SIEM method to poll, e.g. get_all_events or get_clicks_permitted.
+    :param poll_interval:Seconds to sleep between polls.
+    :param start:A datetime or ISO8601 string to start from when there is no checkpoint. Defaults to one hour ago.
+    :param workers:The number of intervals fetched at once while catching up.
+    :param retention:A timedelta for which GUIDs are remembered to drop overlapping events.
+    :param threatType:Passed on to the SIEM method.
+    :param threatStatus:Passed on to the SIEM method.
+    """
+
+    def __init__(
+        self,
+        client,
+        checkpoint_path,
+        method="get_all_events",
+        poll_interval=60,
+        start=None,
+        workers=4,
+        retention=timedelta(hours=2),
+        threatType=None,
+        threatStatus=None,
+    ):
+        self.client = client
+        self.checkpoint = Checkpoint(checkpoint_path)
+        self.method = method
+        self.poll_interval = poll_interval
+        self.start = start
+        self.workers = workers
+        self.seen = RecentGUIDs(retention)
+        self.threatType = threatType
+        self.threatStatus = threatStatus
+
+    def cursor(self):
+        """Return the position polling resumes from."""
+        cursor = self.checkpoint.load()
+        if cursor is not None:
+            return cursor
+        if self.start is not None:
+            return parse_datetime(self.start)
+        return datetime.now(timezone.utc) - CATCH_UP_LAG
+
+    def poll(self):
+        """Yield the events that arrived since the cursor, saving the cursor after each batch."""
+        cursor = self.cursor()
+        now = datetime.now(timezone.utc)
+        if now - cursor > CATCH_UP_LAG:
+            end = now.replace(second=0, microsecond=0)
+            responses = self.client.backfill(
+                cursor,
+                end,
+                method=self.method,
+                workers=self.workers,
+                threatType=self.threatType,
+                threatStatus=self.threatStatus,
+            )
+        else:
+            end = None
+            responses = [
+                getattr(self.client, self.method)(
+                    sinceTime=format_datetime(cursor),
+                    dataformat="JSON",
+                    threatType=self.threatType,
+                    threatStatus=self.threatStatus,
+                )
+            ]
+        for response in responses:
+            yield from self._new_events(response)
+            if response.get("queryEndTime"):
+                self.checkpoint.save(parse_datetime(response["queryEndTime"]))
+        if end is not None:
+            self.checkpoint.save(end)
+
+    def run(self, stop=None):
+        """Poll forever, or until the threading.Event stop is set, yielding (key, event) pairs."""
+        while stop is None or not stop.is_set():
+            yield from self.poll()
+            if stop is not None:
+                stop.wait(self.poll_interval)
+            else:
+                time.sleep(self.poll_interval)
+
+    def _new_events(self, response):
+        for key in SIEM_EVENT_KEYS:
+            for event in response.get(key) or ():
+                guid = event.get("GUID")
+                if guid is None or self.seen.add(guid, event_time(event)):
+                    yield key, event
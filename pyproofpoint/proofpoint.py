@@ -1,12 +1,195 @@
+import collections
+import email.utils
+import itertools
+import json
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
 import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+from .metrics import RequestInfo
+from .stream import (
+    SIEM_EVENT_KEYS,
+    STREAM_CHUNK_SIZE,
+    EventStream,
+    make_parser,
+    parse_stream,
+)
+
+# Responses worth retrying: throttling and transient server-side failures.
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# Fastest available decoder for JSON response bodies.
+default_json_loads = orjson.loads if orjson is not None else json.loads
+
+# Interval limits of the /v2/siem/* endpoints.
+MAX_SIEM_WINDOW = timedelta(hours=1)
+MIN_SIEM_WINDOW = timedelta(seconds=30)
+
+# Largest page sizes accepted by the paginated endpoints.
+MAX_CAMPAIGN_IDS_PAGE_SIZE = 200
+MAX_VAP_PAGE_SIZE = 1000
+MAX_TOP_CLICKERS_PAGE_SIZE = 200
+
+
+def endpoint_family(uri):
+    """Return the endpoint family of an API path, e.g. "siem" for /v2/siem/all."""
+    parts = uri.split("/")
+    return parts[2] if len(parts) > 2 else ""
+
 
+def parse_retry_after(value):
+    """Convert a Retry-After header (delta-seconds or HTTP-date) to seconds, or None."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when is None:
+        return None
+    return max(0.0, when.timestamp() - time.time())
 
-class ProofPoint(object):
-    """ProofPoint Threat Insights API Class."""
 
-    def __init__(self, servicePrincipal, APISecret):
+def parse_datetime(value):
+    """Return value, a datetime or ISO8601 string, as an aware UTC datetime. Naive values are taken as UTC."""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def format_datetime(value):
+    """Format an aware datetime the way the API expects, e.g. 2020-05-01T12:00:00Z."""
+    return value.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def split_interval(start, end, step=MAX_SIEM_WINDOW):
+    """Split the period between start and end into ISO8601 intervals no longer than step.
+
+    A trailing interval shorter than the 30 second API minimum is widened backwards, so it overlaps the one before it.
+    """
+    start = parse_datetime(start)
+    end = parse_datetime(end)
+    if end - start < MIN_SIEM_WINDOW:
+        raise ValueError("The period must be at least thirty seconds long")
+    if not MIN_SIEM_WINDOW <= step <= MAX_SIEM_WINDOW:
+        raise ValueError("step must be between thirty seconds and one hour")
+    intervals = []
+    while start < end:
+        stop = min(start + step, end)
+        if stop - start < MIN_SIEM_WINDOW:
+            start = stop - MIN_SIEM_WINDOW
+        intervals.append(f"{format_datetime(start)}/{format_datetime(stop)}")
+        start = stop
+    return intervals
+
+
+def threat_references(event):
+    """Return (target, threatID, campaignID) for every threat a SIEM event refers to.
+
+    Message events list their threats in threatsInfoMap, and each entry is its own target. Click events
+    carry threatID and campaignId themselves.
+    """
+    references = [
+        (entry, entry.get("threatID"), entry.get("campaignID"))
+        for entry in event.get("threatsInfoMap") or ()
+    ]
+    if "threatID" in event:
+        references.append(
+            (event, event.get("threatID"), event.get("campaignId"))
+        )
+    return references
+
+
+def build_siem_params(
+    interval=None,
+    sinceSeconds=None,
+    sinceTime=None,
+    dataformat="syslog",
+    threatType=None,
+    threatStatus=None,
+):
+    """Validate the time window of a SIEM request and build its query parameters."""
+    if not (interval or sinceSeconds or sinceTime):
+        raise ValueError("Must provide sinceTime or sinceSeconds or interval")
+    return {
+        "interval": interval,
+        "sinceSeconds": sinceSeconds,
+        "sinceTime": sinceTime,
+        "format": dataformat,
+        "threatType": threatType,
+        "threatStatus": threatStatus,
+    }
+
+
+def prepare_params(params):
+    """Drop unset query parameters and render booleans the way the API expects."""
+    if not params:
+        return None
+    prepared = {}
+    for key, value in params.items():
+        if value is None:
+            continue
+        if isinstance(value, bool):
+            value = "true" if value else "false"
+        prepared[key] = value
+    return prepared
+
+
+class BaseProofPoint(object):
+    """Endpoint definitions shared by the sync and async ProofPoint clients.
+
+    Subclasses provide send_request, which performs the HTTP call for a uri and its query parameters.
+
+    :param servicePrincipal:The service principal used as the basic auth username.
+    :param APISecret:The secret used as the basic auth password.
+    :param timeout:Seconds to wait for the API, as a number or (connect, read) tuple. May also be a dict keyed by endpoint family (siem, campaign, forensics, threat, people) with an optional "default" entry.
+    :param max_retries:How many times a throttled, failed or timed out request is retried.
+    :param backoff_factor:Base delay in seconds for exponential backoff between retries. A Retry-After header from the server takes precedence.
+    :param max_backoff:The longest single delay in seconds between retries.
+    :param cache:An optional pyproofpoint.cache.ResponseCache used by get_threat_info, get_campaign and get_forensic.
+    :param rate_limiter:An optional pyproofpoint.ratelimit.RateLimiter pacing every request.
+    :param hooks:Optional request hooks, such as pyproofpoint.metrics.MetricsAggregator, told about the start and end of every API call.
+    :param json_loads:A function decoding a JSON response body from bytes. Defaults to orjson.loads when orjson is installed, else json.loads.
+    """
+
+    def __init__(
+        self,
+        servicePrincipal,
+        APISecret,
+        timeout=60,
+        max_retries=3,
+        backoff_factor=0.5,
+        max_backoff=60,
+        cache=None,
+        rate_limiter=None,
+        hooks=None,
+        json_loads=None,
+    ):
         self.auth = (servicePrincipal, APISecret)
         self.base_url = "https://tap-api-v2.proofpoint.com"
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.cache = cache
+        self.rate_limiter = rate_limiter
+        self.hooks = list(hooks or ())
+        self.json_loads = json_loads or default_json_loads
 
     def get_campaign_ids(self, interval, size=100, page=1):
         """Fetch a list of IDs of campaigns active in a time window sorted by the last updated timestamp.
@@ -47,7 +230,7 @@ class ProofPoint(object):
         :param cid:A string representing a campaignID
         """
         uri = f"/v2/campaign/{cid}"
-        return self.send_request(uri)
+        return self.send_request(uri, cache=True)
 
     def get_forensic(
         self,
@@ -70,7 +253,7 @@ class ProofPoint(object):
             "campaignId": campaignId,
             "includeCampaignForensics": includeCampaignForensics,
         }
-        return self.send_request(uri, params=params)
+        return self.send_request(uri, params=params, cache=True)
 
     def get_clicks_blocked(
         self,
@@ -80,6 +263,9 @@ class ProofPoint(object):
         dataformat="syslog",
         threatType=None,
         threatStatus=None,
+        stream=False,
+        sink=None,
+        keep_compressed=False,
     ):
         """Fetch events for clicks to malicious URLs blocked in the specified time period
 
@@ -89,22 +275,27 @@ class ProofPoint(object):
         :param dataformat:A string specifying the format in which data is returned. If no format is specified, syslog will be used as the default. The following values are accepted: JSON, syslog
         :param threatType:A string specifying which threat type will be returned in the data. If no value is specified, all threat types are returned. The following values are accepted: url, attachment, messageText
         :param threatStatus:A string specifying which threat statuses will be returned in the data. If no value is specified, active and cleared threats are returned. The following values are accepted: active, cleared, falsePositive
+        :param stream:When True, return a pyproofpoint.stream.EventStream that parses the response as it downloads. JSON yields (key, event) pairs for each messagesDelivered, messagesBlocked, clicksPermitted and clicksBlocked event; syslog yields one line at a time. Once read, its values dict holds queryEndTime.
+        :param sink:A file or other object with a write method. When given, the raw response body is copied into it without decoding, and a dict with the number of bytes written and their content encoding is returned.
+        :param keep_compressed:With sink, write the gzip-compressed body as received instead of decompressing it.
 
         """
         uri = f"/v2/siem/clicks/blocked"
-        if not (interval or sinceSeconds or sinceTime):
-            raise ValueError(
-                "Must provide sinceTime or sinceSeconds or interval"
-            )
-        params = {
-            "interval": interval,
-            "sinceSeconds": sinceSeconds,
-            "sinceTime": sinceTime,
-            "format": dataformat,
-            "threatType": threatType,
-            "threatStatus": threatStatus,
-        }
-        return self.send_request(uri, params=params)
+        params = build_siem_params(
+            interval,
+            sinceSeconds,
+            sinceTime,
+            dataformat,
+            threatType,
+            threatStatus,
+        )
+        return self.send_request(
+            uri,
+            params=params,
+            stream=stream,
+            sink=sink,
+            keep_compressed=keep_compressed,
+        )
 
     def get_clicks_permitted(
         self,
@@ -114,6 +305,9 @@ class ProofPoint(object):
         dataformat="syslog",
         threatType=None,
         threatStatus=None,
+        stream=False,
+        sink=None,
+        keep_compressed=False,
     ):
         """Fetch events for clicks to malicious URLs permitted in the specified time period
 
@@ -123,22 +317,27 @@ class ProofPoint(object):
         :param dataformat:A string specifying the format in which data is returned. If no format is specified, syslog will be used as the default. The following values are accepted: JSON, syslog
         :param threatType:A string specifying which threat type will be returned in the data. If no value is specified, all threat types are returned. The following values are accepted: url, attachment, messageText
         :param threatStatus:A string specifying which threat statuses will be returned in the data. If no value is specified, active and cleared threats are returned. The following values are accepted: active, cleared, falsePositive
+        :param stream:When True, return a pyproofpoint.stream.EventStream that parses the response as it downloads. JSON yields (key, event) pairs for each messagesDelivered, messagesBlocked, clicksPermitted and clicksBlocked event; syslog yields one line at a time. Once read, its values dict holds queryEndTime.
+        :param sink:A file or other object with a write method. When given, the raw response body is copied into it without decoding, and a dict with the number of bytes written and their content encoding is returned.
+        :param keep_compressed:With sink, write the gzip-compressed body as received instead of decompressing it.
 
         """
         uri = f"/v2/siem/clicks/permitted"
-        if not (interval or sinceSeconds or sinceTime):
-            raise ValueError(
-                "Must provide sinceTime or sinceSeconds or interval"
-            )
-        params = {
-            "interval": interval,
-            "sinceSeconds": sinceSeconds,
-            "sinceTime": sinceTime,
-            "format": dataformat,
-            "threatType": threatType,
-            "threatStatus": threatStatus,
-        }
-        return self.send_request(uri, params=params)
+        params = build_siem_params(
+            interval,
+            sinceSeconds,
+            sinceTime,
+            dataformat,
+            threatType,
+            threatStatus,
+        )
+        return self.send_request(
+            uri,
+            params=params,
+            stream=stream,
+            sink=sink,
+            keep_compressed=keep_compressed,
+        )
 
     def get_messages_blocked(
         self,
@@ -148,6 +347,9 @@ class ProofPoint(object):
         dataformat="syslog",
         threatType=None,
         threatStatus=None,
+        stream=False,
+        sink=None,
+        keep_compressed=False,
     ):
         """Fetch events for messages blocked in the specified time period which contained a known threat
 
@@ -157,22 +359,27 @@ class ProofPoint(object):
         :param dataformat:A string specifying the format in which data is returned. If no format is specified, syslog will be used as the default. The following values are accepted: JSON, syslog
         :param threatType:A string specifying which threat type will be returned in the data. If no value is specified, all threat types are returned. The following values are accepted: url, attachment, messageText
         :param threatStatus:A string specifying which threat statuses will be returned in the data. If no value is specified, active and cleared threats are returned. The following values are accepted: active, cleared, falsePositive
+        :param stream:When True, return a pyproofpoint.stream.EventStream that parses the response as it downloads. JSON yields (key, event) pairs for each messagesDelivered, messagesBlocked, clicksPermitted and clicksBlocked event; syslog yields one line at a time. Once read, its values dict holds queryEndTime.
+        :param sink:A file or other object with a write method. When given, the raw response body is copied into it without decoding, and a dict with the number of bytes written and their content encoding is returned.
+        :param keep_compressed:With sink, write the gzip-compressed body as received instead of decompressing it.
 
         """
         uri = f"/v2/siem/messages/blocked"
-        if not (interval or sinceSeconds or sinceTime):
-            raise ValueError(
-                "Must provide sinceTime or sinceSeconds or interval"
-            )
-        params = {
-            "interval": interval,
-            "sinceSeconds": sinceSeconds,
-            "sinceTime": sinceTime,
-            "format": dataformat,
-            "threatType": threatType,
-            "threatStatus": threatStatus,
-        }
-        return self.send_request(uri, params=params)
+        params = build_siem_params(
+            interval,
+            sinceSeconds,
+            sinceTime,
+            dataformat,
+            threatType,
+            threatStatus,
+        )
+        return self.send_request(
+            uri,
+            params=params,
+            stream=stream,
+            sink=sink,
+            keep_compressed=keep_compressed,
+        )
 
     def get_messages_delivered(
         self,
@@ -182,6 +389,9 @@ class ProofPoint(object):
         dataformat="syslog",
         threatType=None,
         threatStatus=None,
+        stream=False,
+        sink=None,
+        keep_compressed=False,
     ):
         """Fetch events for messages delivered in the specified time period which contained a known threat
 
@@ -191,22 +401,27 @@ class ProofPoint(object):
         :param dataformat:A string specifying the format in which data is returned. If no format is specified, syslog will be used as the default. The following values are accepted: JSON, syslog
         :param threatType:A string specifying which threat type will be returned in the data. If no value is specified, all threat types are returned. The following values are accepted: url, attachment, messageText
         :param threatStatus:A string specifying which threat statuses will be returned in the data. If no value is specified, active and cleared threats are returned. The following values are accepted: active, cleared, falsePositive
+        :param stream:When True, return a pyproofpoint.stream.EventStream that parses the response as it downloads. JSON yields (key, event) pairs for each messagesDelivered, messagesBlocked, clicksPermitted and clicksBlocked event; syslog yields one line at a time. Once read, its values dict holds queryEndTime.
+        :param sink:A file or other object with a write method. When given, the raw response body is copied into it without decoding, and a dict with the number of bytes written and their content encoding is returned.
+        :param keep_compressed:With sink, write the gzip-compressed body as received instead of decompressing it.
 
         """
         uri = f"/v2/siem/messages/delivered"
-        if not (interval or sinceSeconds or sinceTime):
-            raise ValueError(
-                "Must provide sinceTime or sinceSeconds or interval"
-            )
-        params = {
-            "interval": interval,
-            "sinceSeconds": sinceSeconds,
-            "sinceTime": sinceTime,
-            "format": dataformat,
-            "threatType": threatType,
-            "threatStatus": threatStatus,
-        }
-        return self.send_request(uri, params=params)
+        params = build_siem_params(
+            interval,
+            sinceSeconds,
+            sinceTime,
+            dataformat,
+            threatType,
+            threatStatus,
+        )
+        return self.send_request(
+            uri,
+            params=params,
+            stream=stream,
+            sink=sink,
+            keep_compressed=keep_compressed,
+        )
 
     def get_threat_info(self, threatId):
         """The Threat API allows administrators to pull detailed attributes about individual threats observed in their environment.
@@ -222,7 +437,7 @@ class ProofPoint(object):
                 "Must provide valid ThreatId, value provided:"
                 f" {threatId}"
             )
-        return self.send_request(uri)
+        return self.send_request(uri, cache=True)
 
     def get_issues(
         self,
@@ -232,6 +447,9 @@ class ProofPoint(object):
         dataformat="syslog",
         threatType=None,
         threatStatus=None,
+        stream=False,
+        sink=None,
+        keep_compressed=False,
     ):
         """Fetch events for clicks to malicious URLs permitted and messages delivered containing a known attachment threat within the specified time period
 
@@ -241,22 +459,27 @@ class ProofPoint(object):
         :param dataformat:A string specifying the format in which data is returned. If no format is specified, syslog will be used as the default. The following values are accepted: JSON, syslog
         :param threatType:A string specifying which threat type will be returned in the data. If no value is specified, all threat types are returned. The following values are accepted: url, attachment, messageText
         :param threatStatus:A string specifying which threat statuses will be returned in the data. If no value is specified, active and cleared threats are returned. The following values are accepted: active, cleared, falsePositive
+        :param stream:When True, return a pyproofpoint.stream.EventStream that parses the response as it downloads. JSON yields (key, event) pairs for each messagesDelivered, messagesBlocked, clicksPermitted and clicksBlocked event; syslog yields one line at a time. Once read, its values dict holds queryEndTime.
+        :param sink:A file or other object with a write method. When given, the raw response body is copied into it without decoding, and a dict with the number of bytes written and their content encoding is returned.
+        :param keep_compressed:With sink, write the gzip-compressed body as received instead of decompressing it.
 
         """
         uri = f"/v2/siem/issues"
-        if not (interval or sinceSeconds or sinceTime):
-            raise ValueError(
-                "Must provide sinceTime or sinceSeconds or interval"
-            )
-        params = {
-            "interval": interval,
-            "sinceSeconds": sinceSeconds,
-            "sinceTime": sinceTime,
-            "format": dataformat,
-            "threatType": threatType,
-            "threatStatus": threatStatus,
-        }
-        return self.send_request(uri, params=params)
+        params = build_siem_params(
+            interval,
+            sinceSeconds,
+            sinceTime,
+            dataformat,
+            threatType,
+            threatStatus,
+        )
+        return self.send_request(
+            uri,
+            params=params,
+            stream=stream,
+            sink=sink,
+            keep_compressed=keep_compressed,
+        )
 
     def get_all_events(
         self,
@@ -266,6 +489,9 @@ class ProofPoint(object):
         dataformat="syslog",
         threatType=None,
         threatStatus=None,
+        stream=False,
+        sink=None,
+        keep_compressed=False,
     ):
         """Fetch events for all clicks and messages relating to known threats within the specified time period
 
@@ -275,27 +501,586 @@ class ProofPoint(object):
         :param dataformat:A string specifying the format in which data is returned. If no format is specified, syslog will be used as the default. The following values are accepted: JSON, syslog
         :param threatType:A string specifying which threat type will be returned in the data. If no value is specified, all threat types are returned. The following values are accepted: url, attachment, messageText
         :param threatStatus:A string specifying which threat statuses will be returned in the data. If no value is specified, active and cleared threats are returned. The following values are accepted: active, cleared, falsePositive
+        :param stream:When True, return a pyproofpoint.stream.EventStream that parses the response as it downloads. JSON yields (key, event) pairs for each messagesDelivered, messagesBlocked, clicksPermitted and clicksBlocked event; syslog yields one line at a time. Once read, its values dict holds queryEndTime.
+        :param sink:A file or other object with a write method. When given, the raw response body is copied into it without decoding, and a dict with the number of bytes written and their content encoding is returned.
+        :param keep_compressed:With sink, write the gzip-compressed body as received instead of decompressing it.
 
         """
         uri = f"/v2/siem/all"
-        if not (interval or sinceSeconds or sinceTime):
-            raise ValueError(
-                "Must provide sinceTime or sinceSeconds or interval"
+        params = build_siem_params(
+            interval,
+            sinceSeconds,
+            sinceTime,
+            dataformat,
+            threatType,
+            threatStatus,
+        )
+        return self.send_request(
+            uri,
+            params=params,
+            stream=stream,
+            sink=sink,
+            keep_compressed=keep_compressed,
+        )
+
+    def get_timeout(self, uri):
+        """Return the timeout configured for the endpoint family of uri."""
+        if isinstance(self.timeout, dict):
+            return self.timeout.get(
+                endpoint_family(uri), self.timeout.get("default", 60)
             )
-        params = {
-            "interval": interval,
-            "sinceSeconds": sinceSeconds,
-            "sinceTime": sinceTime,
-            "format": dataformat,
-            "threatType": threatType,
-            "threatStatus": threatStatus,
-        }
-        return self.send_request(uri, params=params)
+        return self.timeout
+
+    def retry_delay(self, attempt, retry_after=None):
+        """Return the seconds to sleep before retry number attempt (0-based)."""
+        delay = parse_retry_after(retry_after)
+        if delay is None:
+            delay = self.backoff_factor * (2 ** attempt)
+        return min(delay, self.max_backoff)
+
+    def cache_key(self, uri, params=None):
+        """Return the key identifying a request in the response cache."""
+        params = prepare_params(params) or {}
+        query = "&".join(f"{k}={params[k]}" for k in sorted(params))
+        return f"{uri}?{query}"
+
+    def add_hook(self, hook):
+        """Register a request hook, an object with on_request_start(info) and on_request_end(info) methods."""
+        self.hooks.append(hook)
+
+    def start_request(self, uri, params=None):
+        """Return the RequestInfo of a new API call after telling the hooks about it."""
+        info = RequestInfo(endpoint_family(uri), uri, params)
+        for hook in self.hooks:
+            hook.on_request_start(info)
+        return info
+
+    def end_request(self, info, error=None):
+        """Complete the RequestInfo of an API call and hand it to the hooks."""
+        info.finish(error)
+        for hook in self.hooks:
+            hook.on_request_end(info)
 
-    def send_request(self, uri, params=None):
+    def release_response(self, uri, status=None):
+        """Give back the rate limiter slot held by a response of uri once its body has been read.
+
+        :param status:The HTTP status code, or None if reading the body failed.
+        """
+        if self.rate_limiter is not None:
+            self.rate_limiter.release(endpoint_family(uri), status)
+
+    def send_request(
+        self,
+        uri,
+        params=None,
+        stream=False,
+        cache=False,
+        sink=None,
+        keep_compressed=False,
+    ):
+        """Perform a GET of uri with retries. Implemented by the sync and async clients.
+
+        By default the decoded JSON response is returned, from a coroutine for the async client.
+
+        :param uri:The API path, e.g. /v2/siem/all.
+        :param params:The query parameters. None values are dropped and booleans sent as true/false.
+        :param stream:Return an EventStream of events parsed as the SIEM response downloads, iterated with async for on the async client. JSON responses yield (key, event) pairs, syslog responses yield lines, and the other top-level fields end up in its values dict.
+        :param cache:Serve and store the response in self.cache when one is set and caches the endpoint family. Concurrent loads of the same request are coalesced into one call.
+        :param sink:A file-like object the raw response body is written to instead of being decoded. A dict with the bytes written and the Content-Encoding of the body ("gzip", or None when decompressed) is returned.
+        :param keep_compressed:With a sink, write the gzip-encoded body as received instead of decompressing it.
+        """
+        raise NotImplementedError
+
+
+class ProofPoint(BaseProofPoint):
+    """ProofPoint Threat Insights API Class.
+
+    Accepts the BaseProofPoint arguments, plus:
+
+    :param pool_size:The number of keep-alive connections kept in the session pool.
+    :param keep_alive:When False, every request asks the server to close the connection.
+    """
+
+    def __init__(
+        self,
+        servicePrincipal,
+        APISecret,
+        timeout=60,
+        pool_size=10,
+        keep_alive=True,
+        max_retries=3,
+        backoff_factor=0.5,
+        max_backoff=60,
+        cache=None,
+        rate_limiter=None,
+        hooks=None,
+        json_loads=None,
+    ):
+        super().__init__(
+            servicePrincipal,
+            APISecret,
+            timeout=timeout,
+            max_retries=max_retries,
+            backoff_factor=backoff_factor,
+            max_backoff=max_backoff,
+            cache=cache,
+            rate_limiter=rate_limiter,
+            hooks=hooks,
+            json_loads=json_loads,
+        )
+        self.session = requests.Session()
+        self.session.auth = self.auth
+        if not keep_alive:
+            self.session.headers["Connection"] = "close"
+        adapter = HTTPAdapter(
+            pool_connections=pool_size, pool_maxsize=pool_size
+        )
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Close the pooled connections held by the client."""
+        self.session.close()
+
+    def send_request(
+        self,
+        uri,
+        params=None,
+        stream=False,
+        cache=False,
+        sink=None,
+        keep_compressed=False,
+    ):
+        if sink is not None:
+            return self.copy_response(uri, params, sink, keep_compressed)
+        if stream:
+            return self.stream_response(uri, params)
+        if cache and self.cache is not None:
+            return self.cache.get_or_load(
+                endpoint_family(uri),
+                self.cache_key(uri, params),
+                lambda: self.fetch_json(uri, params),
+            )
+        return self.fetch_json(uri, params)
+
+    def fetch_json(self, uri, params=None):
+        """Perform a GET with retries and return the decoded JSON response."""
+        if not self.hooks:
+            return self.json_loads(
+                self.get_response(uri, params=params).content
+            )
+        info = self.start_request(uri, params)
+        try:
+            r = self.get_response(uri, params=params, info=info)
+            info.bytes_received = len(r.content)
+            decode_start = time.perf_counter()
+            data = self.json_loads(r.content)
+            info.decode_time = time.perf_counter() - decode_start
+            info.count_events(data)
+        except Exception as e:
+            self.end_request(info, e)
+            raise
+        self.end_request(info)
+        return data
+
+    def copy_response(self, uri, params, sink, keep_compressed=False):
+        """Copy the raw body of a gzip-encoded GET into sink and return its size and encoding."""
+        info = self.start_request(uri, params) if self.hooks else None
+        written = 0
+        try:
+            r = self.get_response(
+                uri,
+                params=params,
+                stream=True,
+                info=info,
+                headers={"Accept-Encoding": "gzip"},
+            )
+            status = None
+            try:
+                for chunk in r.raw.stream(
+                    STREAM_CHUNK_SIZE, decode_content=not keep_compressed
+                ):
+                    sink.write(chunk)
+                    written += len(chunk)
+                status = r.status_code
+            finally:
+                r.close()
+                self.release_response(uri, status)
+        except Exception as e:
+            if info is not None:
+                info.bytes_received = written
+                self.end_request(info, e)
+            raise
+        if info is not None:
+            info.bytes_received = written
+            self.end_request(info)
+        encoding = None
+        if keep_compressed:
+            encoding = r.headers.get("Content-Encoding")
+        return {"bytes": written, "encoding": encoding}
+
+    def stream_response(self, uri, params=None):
+        """Start a streamed GET and return a generator of its events."""
+        info = self.start_request(uri, params) if self.hooks else None
+        try:
+            r = self.get_response(uri, params=params, stream=True, info=info)
+        except Exception as e:
+            if info is not None:
+                self.end_request(info, e)
+            raise
+        parser = make_parser((params or {}).get("format"))
+        close = self._response_closer(uri, r)
+        return EventStream(
+            self.iter_response(r, parser, close, info), parser, close
+        )
+
+    def _response_closer(self, uri, r):
+        """Return a function closing the streamed response r once, then releasing its rate limiter slot."""
+        closed = []
+
+        def close(completed=False):
+            if not closed:
+                closed.append(True)
+                r.close()
+                self.release_response(uri, r.status_code if completed else None)
+
+        return close
+
+    def iter_response(self, r, parser, close, info=None):
+        """Yield the events of a streamed SIEM response, closing it when done.
+
+        :param close:A function closing r, called with whether its body was read completely.
+        """
+        chunks = r.iter_content(STREAM_CHUNK_SIZE)
+        if info is None:
+            completed = False
+            try:
+                yield from parse_stream(chunks, None, parser)
+                completed = True
+            finally:
+                close(completed)
+            return
+        info.event_count = 0
+        error = None
+        completed = False
+        try:
+            for event in parse_stream(
+                self._count_bytes(chunks, info), None, parser
+            ):
+                info.event_count += 1
+                yield event
+            completed = True
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            close(completed)
+            self.end_request(info, error)
+
+    @staticmethod
+    def _count_bytes(chunks, info):
+        for chunk in chunks:
+            info.bytes_received += len(chunk)
+            yield chunk
+
+    def get_response(
+        self, uri, params=None, stream=False, info=None, headers=None
+    ):
+        """Perform a GET with retries and return the successful response.
+
+        With stream=True the body is still to be downloaded, so the rate limiter slot of the request stays
+        held until release_response is called once it has been read.
+
+        :param info:An optional RequestInfo updated with the status, retries and time to first byte.
+        :param headers:Optional extra request headers.
+        """
         url = self.base_url + uri
-        r = requests.get(
-            url, auth=self.auth, params=params, timeout=60
+        params = prepare_params(params)
+        timeout = self.get_timeout(uri)
+        family = endpoint_family(uri)
+        limiter = self.rate_limiter
+        attempt = 0
+        while True:
+            if limiter is not None:
+                limiter.acquire(family)
+            status = retry_after = None
+            held = False
+            try:
+                r = self.session.get(
+                    url,
+                    params=params,
+                    timeout=timeout,
+                    stream=stream,
+                    headers=headers,
+                )
+                status = r.status_code
+                retry_after = r.headers.get("Retry-After")
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt >= self.max_retries:
+                    raise
+                delay = self.retry_delay(attempt)
+            else:
+                if info is not None:
+                    info.status = r.status_code
+                    info.retries = attempt
+                    info.ttfb = r.elapsed.total_seconds()
+                if (
+                    r.status_code not in RETRY_STATUSES
+                    or attempt >= self.max_retries
+                ):
+                    r.raise_for_status()
+                    held = stream
+                    return r
+                delay = self.retry_delay(attempt, retry_after)
+                r.close()
+            finally:
+                # Every acquired slot is given back, whatever ended the attempt, unless the caller still
+                # has a body to stream.
+                if limiter is not None and not held:
+                    limiter.release(family, status, retry_after)
+            time.sleep(delay)
+            attempt += 1
+
+    def backfill(
+        self,
+        start,
+        end,
+        method="get_all_events",
+        workers=4,
+        step=MAX_SIEM_WINDOW,
+        threatType=None,
+        threatStatus=None,
+    ):
+        """Fetch a SIEM period of any length as concurrent API-sized intervals.
+
+        Yields one JSON response per interval, in time order. Events already returned for the previous interval are removed by GUID.
+
+        :param start:A datetime or ISO8601 string at which the period starts.
+        :param end:A datetime or ISO8601 string at which the period ends.
+        :param method:The name of the SIEM method to call, e.g. get_all_events or get_messages_delivered.
+        :param workers:The number of intervals fetched at once.
+        :param step:A timedelta giving the length of each interval. The maximum and default is one hour.
+        :param threatType:Passed on to the SIEM method.
+        :param threatStatus:Passed on to the SIEM method.
+        """
+        fetch = getattr(self, method)
+        intervals = iter(split_interval(start, end, step))
+        seen = set()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            pending = collections.deque()
+            try:
+                for interval in intervals:
+                    pending.append(
+                        executor.submit(
+                            fetch,
+                            interval=interval,
+                            dataformat="JSON",
+                            threatType=threatType,
+                            threatStatus=threatStatus,
+                        )
+                    )
+                    if len(pending) < workers * 2:
+                        continue
+                    seen = yield from self._yield_deduplicated(
+                        pending.popleft().result(), seen
+                    )
+                while pending:
+                    seen = yield from self._yield_deduplicated(
+                        pending.popleft().result(), seen
+                    )
+            finally:
+                for future in pending:
+                    future.cancel()
+
+    def iter_campaign_ids(
+        self, interval, size=MAX_CAMPAIGN_IDS_PAGE_SIZE, prefetch=1
+    ):
+        """Yield every campaign active in a time window, walking all pages of get_campaign_ids.
+
+        :param interval:A string containing an ISO8601-formatted interval, as for get_campaign_ids.
+        :param size:The page size. Defaults to the maximum of 200.
+        :param prefetch:The number of pages fetched in the background while the current one is consumed. The API reports no total, so up to prefetch requests past the last page may be made.
+        """
+        return self._paginate(
+            lambda page: self.get_campaign_ids(interval, size=size, page=page),
+            "campaigns",
+            size,
+            prefetch,
+        )
+
+    def iter_vap(self, window, size=MAX_VAP_PAGE_SIZE, prefetch=1):
+        """Yield every Very Attacked Person for a given period, walking all pages of get_vap.
+
+        :param window:An integer indicating how many days the data should be retrieved for. Accepted values are 14, 30 and 90.
+        :param size:The page size. Defaults to 1000.
+        :param prefetch:The number of pages fetched in the background while the current one is consumed.
+        """
+        return self._paginate(
+            lambda page: self.get_vap(window, size=size, page=page),
+            "users",
+            size,
+            prefetch,
+            total_key="totalVapUsers",
+        )
+
+    def iter_top_clickers(
+        self, window, size=MAX_TOP_CLICKERS_PAGE_SIZE, prefetch=1
+    ):
+        """Yield every top clicker for a given period, walking all pages of get_top_clickers.
+
+        :param window:An integer indicating how many days the data should be retrieved for. Accepted values are 14, 30 and 90.
+        :param size:The page size. Defaults to the maximum of 200.
+        :param prefetch:The number of pages fetched in the background while the current one is consumed.
+        """
+        return self._paginate(
+            lambda page: self.get_top_clickers(window, size=size, page=page),
+            "users",
+            size,
+            prefetch,
+            total_key="totalTopClickers",
         )
-        r.raise_for_status()
-        return r.json()
+
+    def enrich_events(
+        self,
+        events,
+        threats=True,
+        campaigns=True,
+        forensics=False,
+        workers=8,
+        batch_size=1000,
+    ):
+        """Attach threat, campaign and forensic details to SIEM events, fetching each unique ID once.
+
+        Details are stored under the "threatInfo", "campaignInfo" and "forensicsInfo" keys of every
+        threatsInfoMap entry, or of the event itself for clicks, leaving the API's own fields untouched.
+        IDs the API does not know (404) resolve to None. Events are enriched in place and yielded in their
+        original order.
+
+        :param events:A list or other iterable of SIEM message and click events.
+        :param threats:Attach get_threat_info results.
+        :param campaigns:Attach get_campaign results.
+        :param forensics:Attach get_forensic results for each threat.
+        :param workers:The number of lookups in flight at once.
+        :param batch_size:The number of events read from events before their IDs are resolved.
+        """
+        lookups = []
+        if threats:
+            lookups.append(("threatInfo", 1, self.get_threat_info))
+        if campaigns:
+            lookups.append(("campaignInfo", 2, self.get_campaign))
+        if forensics:
+            lookups.append(
+                (
+                    "forensicsInfo",
+                    1,
+                    lambda threatId: self.get_forensic(threatId=threatId),
+                )
+            )
+        resolved = {name: {} for name, _, _ in lookups}
+        events = iter(events)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            while True:
+                batch = list(itertools.islice(events, batch_size))
+                if not batch:
+                    return
+                references = [
+                    reference
+                    for event in batch
+                    for reference in threat_references(event)
+                ]
+                futures = {}
+                for name, index, fetch in lookups:
+                    for reference in references:
+                        key = reference[index]
+                        if (
+                            key
+                            and key not in resolved[name]
+                            and (name, key) not in futures
+                        ):
+                            futures[name, key] = executor.submit(
+                                self._lookup, fetch, key
+                            )
+                for (name, key), future in futures.items():
+                    resolved[name][key] = future.result()
+                for name, index, _ in lookups:
+                    for reference in references:
+                        if reference[index]:
+                            reference[0][name] = resolved[name][reference[index]]
+                yield from batch
+
+    @staticmethod
+    def _lookup(fetch, key):
+        """Call fetch(key), returning None when the API reports the ID as not found."""
+        try:
+            return fetch(key)
+        except requests.HTTPError as e:
+            if e.response is not None and e.response.status_code == 404:
+                return None
+            raise
+
+    @staticmethod
+    def _paginate(fetch, key, size, prefetch, total_key=None):
+        """Yield the items under key of every page, keeping up to prefetch pages in flight.
+
+        Paging stops at a short page, or at the last page implied by total_key once the first page reports it.
+        Without a total, up to prefetch requests past the last page may already be sent when it arrives; they
+        are left to finish in the background rather than waited for.
+        """
+        last_page = None
+        next_page = 1
+        pending = collections.deque()
+        executor = ThreadPoolExecutor(max_workers=prefetch + 1)
+        try:
+            while True:
+                for page, future in pending:
+                    # A finished short page ends paging before it is reached.
+                    if (
+                        future.done()
+                        and not future.exception()
+                        and len(future.result().get(key) or ()) < size
+                    ):
+                        if last_page is None or page < last_page:
+                            last_page = page
+                        break
+                while len(pending) <= prefetch and (
+                    last_page is None or next_page <= last_page
+                ):
+                    pending.append((next_page, executor.submit(fetch, next_page)))
+                    next_page += 1
+                if not pending:
+                    return
+                page, future = pending.popleft()
+                data = future.result()
+                items = data.get(key) or []
+                total = data.get(total_key) if total_key else None
+                if last_page is None and total is not None:
+                    last_page = max(1, math.ceil(total / size))
+                yield from items
+                if len(items) < size or page == last_page:
+                    return
+        finally:
+            for _, future in pending:
+                future.cancel()
+            executor.shutdown(wait=False)
+
+    @staticmethod
+    def _yield_deduplicated(response, seen):
+        """Yield response without events whose GUID is in seen, and return the GUIDs it held."""
+        guids = set()
+        for key in SIEM_EVENT_KEYS:
+            events = response.get(key)
+            if not events:
+                continue
+            response[key] = [
+                event for event in events if event.get("GUID") not in seen
+            ]
+            guids.update(event.get("GUID") for event in events)
+        guids.discard(None)
+        yield response
+        return guids
@@ -0,0 +1,256 @@
+import asyncio
+import collections
+import threading
+import time
+
+from .proofpoint import parse_retry_after
+
+
+class TokenBucket(object):
+    """Thread-safe token bucket that adapts its rate to throttling responses.
+
+    The rate is halved on every throttle and grows back linearly towards the configured rate on success.
+
+    :param rate:Tokens added per second.
+    :param capacity:The maximum number of tokens, i.e. the largest burst.
+    :param min_rate:The lowest rate the bucket adapts down to. Defaults to a tenth of rate.
+    """
+
+    def __init__(self, rate, capacity, min_rate=None):
+        self.max_rate = float(rate)
+        self.min_rate = self.max_rate / 10 if min_rate is None else min_rate
+        self.rate = self.max_rate
+        self.capacity = float(capacity)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """Take a token and return the seconds to wait before using it."""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(
+                self.capacity, self.tokens + (now - self.updated) * self.rate
+            )
+            self.updated = now
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+            return max(wait, self.paused_until - now)
+
+    def throttled(self, retry_after=None):
+        """Slow down after a 429, pausing every caller for retry_after seconds when given."""
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+            if retry_after:
+                self.paused_until = max(
+                    self.paused_until, time.monotonic() + retry_after
+                )
+
+    def succeeded(self):
+        """Ramp the rate back up after a successful request."""
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate / 20)
+
+
+class _Waiter(object):
+    __slots__ = ("wake", "granted")
+
+    def __init__(self, wake):
+        self.wake = wake
+        self.granted = False
+
+
+def _set_done(future):
+    if not future.done():
+        future.set_result(None)
+
+
+class AdaptiveConcurrency(object):
+    """Limit on requests in flight that halves on throttling and grows by one per window of successes.
+
+    Threads and asyncio tasks waiting for a slot are queued together and served in arrival order.
+
+    :param maximum:The largest number of requests in flight.
+    :param minimum:The smallest the limit adapts down to.
+    """
+
+    def __init__(self, maximum, minimum=1):
+        self.maximum = maximum
+        self.minimum = minimum
+        self.limit = float(maximum)
+        self.in_flight = 0
+        self._waiters = collections.deque()
+        self._lock = threading.Lock()
+
+    def try_acquire(self):
+        """Take a slot if one is free and nobody is queued for it, returning whether it succeeded."""
+        with self._lock:
+            if self._waiters or self.in_flight >= int(self.limit):
+                return False
+            self.in_flight += 1
+            return True
+
+    def acquire(self):
+        """Block until a slot is free and take it."""
+        event = threading.Event()
+        waiter = self._enqueue(event.set)
+        if waiter is None:
+            return
+        try:
+            event.wait()
+        except BaseException:
+            self._abandon(waiter)
+            raise
+
+    async def acquire_async(self):
+        """Wait without blocking the event loop until a slot is free and take it."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        waiter = self._enqueue(
+            lambda: loop.call_soon_threadsafe(_set_done, future)
+        )
+        if waiter is None:
+            return
+        try:
+            await future
+        except BaseException:
+            self._abandon(waiter)
+            raise
+
+    def release(self, throttled=False, succeeded=True):
+        """Give a slot back and adapt the limit to the outcome of the request.
+
+        :param throttled:The request was throttled, which halves the limit.
+        :param succeeded:The request succeeded, which grows the limit. Failures leave it unchanged.
+        """
+        with self._lock:
+            self.in_flight -= 1
+            if throttled:
+                self.limit = max(self.minimum, self.limit / 2)
+            elif succeeded:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self._wake_waiters()
+
+    def discard(self):
+        """Give back a slot whose request was never sent, leaving the limit as it is."""
+        with self._lock:
+            self.in_flight -= 1
+            self._wake_waiters()
+
+    def _enqueue(self, wake):
+        # Returns None when a slot was taken at once, else the queued waiter.
+        with self._lock:
+            if not self._waiters and self.in_flight < int(self.limit):
+                self.in_flight += 1
+                return None
+            waiter = _Waiter(wake)
+            self._waiters.append(waiter)
+            return waiter
+
+    def _abandon(self, waiter):
+        # Called when a waiter is interrupted, giving back the slot if it was handed one meanwhile.
+        with self._lock:
+            if waiter.granted:
+                self.in_flight -= 1
+                self._wake_waiters()
+            else:
+                self._waiters.remove(waiter)
+
+    def _wake_waiters(self):
+        while self._waiters and self.in_flight < int(self.limit):
+            waiter = self._waiters.popleft()
+            waiter.granted = True
+            self.in_flight += 1
+            waiter.wake()
+
+
+class RateLimiter(object):
+    """Client-side quota enforcement for the ProofPoint clients, per endpoint family.
+
+    Limits are given as (requests, seconds) or (requests, seconds, burst) tuples keyed by endpoint family
+    (siem, campaign, forensics, threat, people), with an optional "default" entry. A daily quota of 1800
+    SIEM requests is {"siem": (1800, 86400, 10)}. Families without a limit are not paced. The limiter may
+    be shared by several clients, threads and asyncio tasks.
+
+    :param limits:A dict of request quotas keyed by endpoint family.
+    :param max_concurrency:An optional limit on requests in flight per family, adapted to throttling.
+    """
+
+    def __init__(self, limits=None, max_concurrency=None):
+        self.buckets = {}
+        for family, limit in (limits or {}).items():
+            requests, seconds = limit[:2]
+            burst = limit[2] if len(limit) > 2 else requests
+            self.buckets[family] = TokenBucket(requests / seconds, burst)
+        self.max_concurrency = max_concurrency
+        self.concurrency = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, family):
+        return self.buckets.get(family, self.buckets.get("default"))
+
+    def concurrency_limit(self, family):
+        if self.max_concurrency is None:
+            return None
+        with self._lock:
+            limit = self.concurrency.get(family)
+            if limit is None:
+                limit = self.concurrency[family] = AdaptiveConcurrency(
+                    self.max_concurrency
+                )
+            return limit
+
+    def acquire(self, family):
+        """Block until a request of the endpoint family may be sent."""
+        limit = self.concurrency_limit(family)
+        if limit is not None:
+            limit.acquire()
+        bucket = self.bucket(family)
+        if bucket is None:
+            return
+        wait = bucket.reserve()
+        if wait <= 0:
+            return
+        try:
+            time.sleep(wait)
+        except BaseException:
+            if limit is not None:
+                limit.discard()
+            raise
+
+    async def acquire_async(self, family):
+        """Wait without blocking the event loop until a request of the endpoint family may be sent."""
+        limit = self.concurrency_limit(family)
+        if limit is not None:
+            await limit.acquire_async()
+        bucket = self.bucket(family)
+        if bucket is None:
+            return
+        wait = bucket.reserve()
+        if wait <= 0:
+            return
+        try:
+            await asyncio.sleep(wait)
+        except BaseException:
+            if limit is not None:
+                limit.discard()
+            raise
+
+    def release(self, family, status=None, retry_after=None):
+        """Report the outcome of a request acquired for the endpoint family.
+
+        :param status:The HTTP status code, or None if the request failed without a complete response. Only statuses below 500 grow the concurrency limit.
+        :param retry_after:The Retry-After header of the response, if any.
+        """
+        throttled = status == 429
+        limit = self.concurrency_limit(family)
+        if limit is not None:
+            limit.release(throttled, status is not None and status < 500)
+        bucket = self.bucket(family)
+        if bucket is None or status is None:
+            return
+        if throttled:
+            bucket.throttled(parse_retry_after(retry_after))
+        elif status < 500:
+            bucket.succeeded()
@@ -0,0 +1,208 @@
+import codecs
+import json
+
+# Event arrays of a JSON SIEM response.
+SIEM_EVENT_KEYS = (
+    "messagesDelivered",
+    "messagesBlocked",
+    "clicksPermitted",
+    "clicksBlocked",
+)
+
+STREAM_CHUNK_SIZE = 64 * 1024
+
+_WHITESPACE = " \t\n\r"
+_NUMBER_CHARS = "0123456789.eE+-"
+
+
+class SIEMEventParser(object):
+    """Incremental parser for JSON SIEM responses.
+
+    Bytes are fed in as they arrive and (key, event) pairs come out, one per element of the SIEM_EVENT_KEYS
+    arrays, so only the event being parsed is held in memory. Other top-level values, such as queryEndTime,
+    are kept in the values dict.
+    """
+
+    def __init__(self, keys=SIEM_EVENT_KEYS):
+        self.keys = keys
+        self.values = {}
+        self._decoder = json.JSONDecoder()
+        self._utf8 = codecs.getincrementaldecoder("utf-8")()
+        self._buffer = ""
+        self._pos = 0
+        self._state = "start"
+        self._key = None
+
+    def feed(self, data):
+        """Parse the next chunk of the body and return the completed events."""
+        if isinstance(data, bytes):
+            data = self._utf8.decode(data)
+        self._buffer = self._buffer[self._pos :] + data
+        self._pos = 0
+        events = []
+        while self._step(events):
+            pass
+        return events
+
+    def close(self):
+        """Finish parsing, raising ValueError if the body was truncated or invalid."""
+        events = self.feed(self._utf8.decode(b"", final=True))
+        if self._state != "done" or self._buffer[self._pos :].strip():
+            raise ValueError("Truncated or invalid SIEM JSON response")
+        return events
+
+    def _decode(self):
+        """Decode the JSON value at the current position, or return False if it is incomplete."""
+        try:
+            value, end = self._decoder.raw_decode(self._buffer, self._pos)
+        except json.JSONDecodeError:
+            return False, None
+        if isinstance(value, (int, float)) and not self._buffer[end:].lstrip(
+            _NUMBER_CHARS
+        ):
+            # A number at the end of the buffer, e.g. 1 of 1.5 or 1e of 1e5, may continue in the next chunk.
+            return False, None
+        self._pos = end
+        return True, value
+
+    def _step(self, events):
+        buffer = self._buffer
+        while self._pos < len(buffer) and buffer[self._pos] in _WHITESPACE:
+            self._pos += 1
+        if self._pos >= len(buffer) or self._state == "done":
+            return False
+        char = buffer[self._pos]
+        if self._state == "start":
+            if char != "{":
+                raise ValueError("SIEM JSON response must be an object")
+            self._pos += 1
+            self._state = "key"
+        elif self._state == "key":
+            if char == "}":
+                self._pos += 1
+                self._state = "done"
+            elif char == ",":
+                self._pos += 1
+            else:
+                complete, self._key = self._decode()
+                if not complete:
+                    return False
+                self._state = "colon"
+        elif self._state == "colon":
+            if char != ":":
+                raise ValueError("Invalid SIEM JSON response")
+            self._pos += 1
+            self._state = "value"
+        elif self._state == "value":
+            if char == "[" and self._key in self.keys:
+                self._pos += 1
+                self._state = "array"
+            else:
+                complete, value = self._decode()
+                if not complete:
+                    return False
+                self.values[self._key] = value
+                self._state = "key"
+        elif self._state == "array":
+            if char == "]":
+                self._pos += 1
+                self._state = "key"
+            elif char == ",":
+                self._pos += 1
+            else:
+                complete, event = self._decode()
+                if not complete:
+                    return False
+                events.append((self._key, event))
+        return True
+
+
+class SyslogLineParser(object):
+    """Incremental parser for syslog SIEM responses, producing one line at a time."""
+
+    def __init__(self):
+        self.values = {}
+        self._utf8 = codecs.getincrementaldecoder("utf-8")()
+        self._partial = ""
+
+    def feed(self, data):
+        """Parse the next chunk of the body and return the completed lines."""
+        if isinstance(data, bytes):
+            data = self._utf8.decode(data)
+        lines = (self._partial + data).split("\n")
+        self._partial = lines.pop()
+        return [line.rstrip("\r") for line in lines if line.strip()]
+
+    def close(self):
+        """Finish parsing and return the last line, if the body did not end with a newline."""
+        line = self._partial + self._utf8.decode(b"", final=True)
+        self._partial = ""
+        return [line.rstrip("\r")] if line.strip() else []
+
+
+def make_parser(dataformat):
+    """Return the incremental parser for a SIEM dataformat (JSON or syslog)."""
+    if dataformat and dataformat.lower() == "json":
+        return SIEMEventParser()
+    return SyslogLineParser()
+
+
+def parse_stream(chunks, dataformat, parser=None):
+    """Yield events from an iterable of SIEM response body chunks.
+
+    JSON bodies yield (key, event) pairs, where key names the array the event came from, e.g. messagesDelivered.
+    Syslog bodies yield one line per event.
+
+    :param parser:An optional parser from make_parser to use, e.g. to read its values afterwards.
+    """
+    if parser is None:
+        parser = make_parser(dataformat)
+    for chunk in chunks:
+        yield from parser.feed(chunk)
+    yield from parser.close()
+
+
+class EventStream(object):
+    """Events of a streamed SIEM response, returned by the SIEM methods with stream=True.
+
+    Wraps the generator, or async generator for the async client, that parses the response. Once every
+    event has been read, values holds the other top-level fields of a JSON response, such as queryEndTime.
+    Read the stream to the end or close it to free its connection and rate limiter slot.
+    """
+
+    def __init__(self, events, parser, on_close=None):
+        self._events = events
+        self.parser = parser
+        self._on_close = on_close
+
+    @property
+    def values(self):
+        return self.parser.values
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self._events)
+
+    def close(self):
+        """Stop reading and close the response."""
+        self._events.close()
+        if self._on_close is not None:
+            self._on_close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __aiter__(self):
+        return self
+
+    def __anext__(self):
+        return self._events.__anext__()
+
+    async def aclose(self):
+        """Stop reading and close the response of the async client."""
+        await self._events.aclose()
@@ -26,6 +26,11 @@ setuptools.setup(
         "Topic :: Security",
         "Topic :: Internet",
     ],
-    python_requires=">=3.5",
+    python_requires=">=3.7",
     install_requires=["requests"],
+    extras_require={
+        "async": ["aiohttp"],
+        "export": ["pyarrow"],
+        "fast": ["orjson"],
+    },
 )
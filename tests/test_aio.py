@@ -0,0 +1,73 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("aiohttp")
+
+from pyproofpoint.aio import AsyncProofPoint  # noqa: E402
+from pyproofpoint.cache import ResponseCache  # noqa: E402
+
+
+def make_client(stub, **kwargs):
+    pp = AsyncProofPoint("principal", "secret", backoff_factor=0, **kwargs)
+    pp.base_url = stub.url
+    return pp
+
+
+def test_client_built_outside_a_loop_works_in_several_loops(stub):
+    pp = make_client(stub, max_concurrency=2)
+
+    async def fetch(threat_ids):
+        try:
+            return await asyncio.gather(
+                *(pp.get_threat_info(threat_id) for threat_id in threat_ids)
+            )
+        finally:
+            await pp.close()
+
+    assert asyncio.run(fetch(["a", "b", "c"]))[2] == {
+        "path": "/v2/threat/summary/c"
+    }
+    assert asyncio.run(fetch(["d"])) == [{"path": "/v2/threat/summary/d"}]
+
+
+def test_cancelled_cache_leader_hands_the_load_to_a_follower(stub):
+    stub.delay = 0.2
+    pp = make_client(stub, cache=ResponseCache())
+
+    async def main():
+        try:
+            leader = asyncio.ensure_future(
+                asyncio.wait_for(pp.get_threat_info("a"), 0.05)
+            )
+            await asyncio.sleep(0.01)
+            follower = asyncio.ensure_future(pp.get_threat_info("a"))
+            return await asyncio.gather(
+                leader, follower, return_exceptions=True
+            )
+        finally:
+            await pp.close()
+
+    leader, follower = asyncio.run(main())
+    assert isinstance(leader, asyncio.TimeoutError)
+    assert follower == {"path": "/v2/threat/summary/a"}
+    assert pp.cache.stats["misses"] + pp.cache.stats["coalesced"] == 2
+
+
+def test_streamed_response_exposes_query_end_time(stub):
+    body = b'{"queryEndTime": "2020-05-01T13:00:00Z", "clicksBlocked": [{"GUID": "c1"}]}'
+    stub.responses.append((200, body, {}))
+    pp = make_client(stub)
+
+    async def main():
+        try:
+            events = await pp.get_all_events(
+                sinceSeconds=3600, dataformat="JSON", stream=True
+            )
+            return [event async for event in events], events.values
+        finally:
+            await pp.close()
+
+    events, values = asyncio.run(main())
+    assert events == [("clicksBlocked", {"GUID": "c1"})]
+    assert values == {"queryEndTime": "2020-05-01T13:00:00Z"}
@@ -0,0 +1,51 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from pyproofpoint.cache import ResponseCache
+
+
+def test_concurrent_loads_are_coalesced_and_counted_once():
+    cache = ResponseCache()
+    loads = []
+    lock = threading.Lock()
+
+    def load(key):
+        with lock:
+            loads.append(key)
+        time.sleep(0.01)
+        return {"id": key}
+
+    keys = [f"threat-{i % 20}" for i in range(200)]
+    with ThreadPoolExecutor(50) as pool:
+        results = list(
+            pool.map(
+                lambda key: cache.get_or_load(
+                    "threat", key, lambda: load(key)
+                ),
+                keys,
+            )
+        )
+    assert results == [{"id": key} for key in keys]
+    assert sorted(loads) == sorted(set(keys))
+    stats = cache.stats
+    assert stats["misses"] == 20
+    assert stats["hits"] + stats["misses"] + stats["coalesced"] == 200
+
+
+def test_uncached_family_always_loads():
+    cache = ResponseCache()
+    assert cache.get_or_load("siem", "key", lambda: 1) == 1
+    assert cache.get_or_load("siem", "key", lambda: 2) == 2
+    assert cache.stats["misses"] == 0
+
+
+def test_persistent_tier_warms_a_new_cache(tmp_path):
+    path = str(tmp_path / "cache.db")
+    cache = ResponseCache(path=path)
+    cache.get_or_load("campaign", "key", lambda: {"id": "c"})
+    cache.close()
+    cache = ResponseCache(path=path)
+    assert cache.lookup("key") == (True, {"id": "c"})
+    assert cache.stats["hits"] == 1
+    cache.close()
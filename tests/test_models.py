@@ -0,0 +1,75 @@
+import csv
+
+import pytest
+
+from pyproofpoint.models import (
+    ClickEvent,
+    MessageEvent,
+    ThreatInfo,
+    export_records,
+    from_siem_response,
+)
+
+THREAT = {
+    "campaignID": "c1",
+    "classification": "MALWARE",
+    "threatID": "t1",
+    "threatStatus": "active",
+    "threatType": "URL",
+}
+MESSAGE = {
+    "GUID": "m1",
+    "messageTime": "2020-05-01T12:00:00.000Z",
+    "messageParts": [{"contentType": "text/plain", "md5": "abc"}],
+    "modulesRun": ["pdr", "sandbox"],
+    "recipient": ["user@example.com"],
+    "threatsInfoMap": [THREAT],
+}
+
+
+def test_constructor_converts_like_from_dict():
+    record = MessageEvent(**MESSAGE)
+    assert record == MessageEvent.from_dict(MESSAGE)
+    assert record.modulesRun == ("pdr", "sandbox")
+    assert isinstance(record.messageParts, str)
+    assert isinstance(record.threatsInfoMap[0], ThreatInfo)
+    data = record.to_dict()
+    assert data["messageParts"] == MESSAGE["messageParts"]
+    assert data["threatsInfoMap"][0]["threatID"] == "t1"
+
+
+def test_constructor_accepts_converted_values():
+    record = MessageEvent.from_dict(MESSAGE)
+    copy = MessageEvent(
+        GUID="m1",
+        messageTime=record.messageTime,
+        messageParts=MESSAGE["messageParts"],
+        modulesRun=record.modulesRun,
+        recipient=record.recipient,
+        threatsInfoMap=record.threatsInfoMap,
+    )
+    assert copy == record
+
+
+def test_from_siem_response_splits_messages_and_clicks():
+    click = {"GUID": "k1", "threatID": "t1", "clickTime": "2020-05-01T12:00:00Z"}
+    records = from_siem_response(
+        {"messagesDelivered": [MESSAGE], "clicksPermitted": [click]}
+    )
+    assert [r.GUID for r in records["messages"]] == ["m1"]
+    assert isinstance(records["clicks"][0], ClickEvent)
+
+
+def test_csv_export_of_constructed_records(tmp_path):
+    path = str(tmp_path / "messages.csv")
+    export_records([MessageEvent(**MESSAGE)], path)
+    with open(path, newline="", encoding="utf-8") as fh:
+        rows = list(csv.DictReader(fh))
+    assert rows[0]["GUID"] == "m1"
+
+
+def test_parquet_export_of_constructed_records(tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    path = str(tmp_path / "messages.parquet")
+    export_records([MessageEvent(**MESSAGE)], path)
+    assert pq.read_table(path).column("GUID").to_pylist() == ["m1"]
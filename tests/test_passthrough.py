@@ -0,0 +1,98 @@
+import asyncio
+import gzip
+import io
+import json
+
+import pytest
+
+from pyproofpoint.proofpoint import ProofPoint
+
+BODY = json.dumps(
+    {"queryEndTime": "2020-05-01T13:00:00Z", "clicksBlocked": [{"GUID": "c1"}]}
+).encode()
+GZIPPED = (200, gzip.compress(BODY), {"Content-Encoding": "gzip"})
+
+
+def make_client(stub, cls=ProofPoint, **kwargs):
+    pp = cls("principal", "secret", **kwargs)
+    pp.base_url = stub.url
+    return pp
+
+
+def test_sink_keeps_the_gzip_body(stub):
+    stub.responses.append(GZIPPED)
+    sink = io.BytesIO()
+    with make_client(stub) as pp:
+        result = pp.get_all_events(
+            sinceSeconds=60, dataformat="JSON", sink=sink, keep_compressed=True
+        )
+    assert result == {"bytes": len(GZIPPED[1]), "encoding": "gzip"}
+    assert gzip.decompress(sink.getvalue()) == BODY
+
+
+def test_sink_decompresses_by_default(stub):
+    stub.responses.append(GZIPPED)
+    sink = io.BytesIO()
+    with make_client(stub) as pp:
+        result = pp.get_all_events(sinceSeconds=60, dataformat="JSON", sink=sink)
+    assert result == {"bytes": len(BODY), "encoding": None}
+    assert json.loads(sink.getvalue()) == json.loads(BODY)
+
+
+def test_custom_json_loads_is_used(stub):
+    calls = []
+
+    def loads(body):
+        calls.append(body)
+        return json.loads(body)
+
+    stub.responses.append(GZIPPED)
+    with make_client(stub, json_loads=loads) as pp:
+        data = pp.get_all_events(sinceSeconds=60, dataformat="JSON")
+    assert data == json.loads(BODY)
+    assert calls == [BODY]
+
+
+def test_async_sink_and_json_loads(stub):
+    aio = pytest.importorskip("pyproofpoint.aio")
+    calls = []
+
+    def loads(body):
+        calls.append(body)
+        return json.loads(body)
+
+    class AsyncSink(object):
+        def __init__(self):
+            self.data = b""
+
+        async def write(self, chunk):
+            self.data += chunk
+
+    stub.responses.extend([GZIPPED, GZIPPED, GZIPPED])
+    pp = make_client(stub, aio.AsyncProofPoint, json_loads=loads)
+    compressed, plain = AsyncSink(), io.BytesIO()
+
+    async def main():
+        try:
+            return (
+                await pp.get_all_events(
+                    sinceSeconds=60,
+                    dataformat="JSON",
+                    sink=compressed,
+                    keep_compressed=True,
+                ),
+                await pp.get_all_events(
+                    sinceSeconds=60, dataformat="JSON", sink=plain
+                ),
+                await pp.get_all_events(sinceSeconds=60, dataformat="JSON"),
+            )
+        finally:
+            await pp.close()
+
+    kept, decoded, data = asyncio.run(main())
+    assert kept == {"bytes": len(GZIPPED[1]), "encoding": "gzip"}
+    assert gzip.decompress(compressed.data) == BODY
+    assert decoded == {"bytes": len(BODY), "encoding": None}
+    assert plain.getvalue() == BODY
+    assert data == json.loads(BODY)
+    assert calls == [BODY]
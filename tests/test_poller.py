@@ -0,0 +1,56 @@
+import json
+from datetime import datetime, timedelta, timezone
+
+from pyproofpoint.poller import Checkpoint, RecentGUIDs, SIEMPoller
+
+START = datetime(2020, 5, 1, tzinfo=timezone.utc).timestamp()
+
+
+def test_recent_guids_expire_by_event_time():
+    seen = RecentGUIDs(retention=timedelta(hours=2))
+    # A ten hour catch-up arriving within a second of wall time.
+    for minute in range(600):
+        assert seen.add(f"guid-{minute}", START + minute * 60)
+    assert len(seen) <= 2 * 60 + 5
+    assert "guid-0" not in seen
+    assert "guid-599" in seen
+    assert not seen.add("guid-599", START + 599 * 60)
+
+
+def test_recent_guids_drop_events_older_than_retention():
+    seen = RecentGUIDs(retention=timedelta(hours=2))
+    seen.add("new", START + 10 * 3600)
+    assert seen.add("old", START)
+    assert "old" not in seen
+
+
+class FakeClient(object):
+    def __init__(self, responses):
+        self.responses = responses
+
+    def get_all_events(self, **kwargs):
+        return self.responses.pop(0)
+
+
+def test_poller_drops_overlapping_events_and_saves_cursor(tmp_path):
+    path = str(tmp_path / "checkpoint.json")
+    now = datetime.now(timezone.utc).replace(microsecond=0)
+    event = {"GUID": "a", "messageTime": now.isoformat()}
+    click = {"GUID": "b", "clickTime": now.isoformat()}
+    end = now.strftime("%Y-%m-%dT%H:%M:%SZ")
+    client = FakeClient(
+        [
+            {"queryEndTime": end, "messagesDelivered": [event]},
+            {
+                "queryEndTime": end,
+                "messagesDelivered": [event],
+                "clicksPermitted": [click],
+            },
+        ]
+    )
+    poller = SIEMPoller(client, path, start=now - timedelta(minutes=10))
+    assert list(poller.poll()) == [("messagesDelivered", event)]
+    assert list(poller.poll()) == [("clicksPermitted", click)]
+    with open(path, encoding="utf-8") as fh:
+        assert json.load(fh) == {"cursor": end}
+    assert Checkpoint(path).load() == now
@@ -0,0 +1,97 @@
+import time
+
+import pytest
+
+from pyproofpoint.proofpoint import ProofPoint
+
+
+def make_client(stub, **kwargs):
+    pp = ProofPoint("principal", "secret", backoff_factor=0, **kwargs)
+    pp.base_url = stub.url
+    return pp
+
+
+def test_requests_reuse_one_connection(stub):
+    with make_client(stub) as pp:
+        for threat_id in ("a", "b", "c", "d", "e"):
+            assert pp.get_threat_info(threat_id) == {
+                "path": f"/v2/threat/summary/{threat_id}"
+            }
+        pp.get_all_events(sinceSeconds=3600, dataformat="JSON")
+    assert len(stub.paths) == 6
+    assert stub.connections == 1
+
+
+def test_keep_alive_disabled_opens_a_connection_per_request(stub):
+    with make_client(stub, keep_alive=False) as pp:
+        for threat_id in ("a", "b", "c"):
+            pp.get_threat_info(threat_id)
+    assert stub.connections == 3
+
+
+def test_throttled_request_is_retried_on_the_same_connection(stub):
+    stub.responses.append((429, b"", {"Retry-After": "0"}))
+    with make_client(stub) as pp:
+        assert pp.get_threat_info("a") == {"path": "/v2/threat/summary/a"}
+    assert len(stub.paths) == 2
+    assert stub.connections == 1
+
+
+def fake_pages(total, size, delay=0.0):
+    calls = []
+
+    def fetch(page):
+        calls.append(page)
+        time.sleep(delay)
+        count = max(0, min(size, total - (page - 1) * size))
+        start = (page - 1) * size
+        return {"campaigns": list(range(start, start + count))}
+
+    return fetch, calls
+
+
+@pytest.mark.parametrize("prefetch", [1, 4])
+def test_paginate_without_total_stops_at_the_short_page(prefetch):
+    fetch, calls = fake_pages(1000, 200)
+    items = list(ProofPoint._paginate(fetch, "campaigns", 200, prefetch))
+    assert items == list(range(1000))
+    assert len(calls) <= 6 + prefetch
+
+
+def test_paginate_does_not_wait_for_abandoned_pages():
+    fetch, calls = fake_pages(1000, 200, delay=0.3)
+    pages = ProofPoint._paginate(fetch, "campaigns", 200, 4)
+    assert next(pages) == 0
+    start = time.perf_counter()
+    pages.close()
+    assert time.perf_counter() - start < 0.2
+
+
+def test_enrich_events_fetches_each_id_once_and_keeps_api_fields(stub):
+    threat = {
+        "threat": "http://malicious.example/x",
+        "threatID": "t1",
+        "campaignID": "c1",
+    }
+    events = [
+        {"GUID": "m1", "threatsInfoMap": [dict(threat)]},
+        {"GUID": "m2", "threatsInfoMap": [dict(threat, threatID="t2")]},
+        {"GUID": "k1", "threatID": "t1", "campaignId": "c1", "url": "u"},
+    ]
+    with make_client(stub) as pp:
+        enriched = list(pp.enrich_events(events, forensics=True))
+    assert [event["GUID"] for event in enriched] == ["m1", "m2", "k1"]
+    entry = enriched[0]["threatsInfoMap"][0]
+    assert entry["threat"] == "http://malicious.example/x"
+    assert entry["threatInfo"] == {"path": "/v2/threat/summary/t1"}
+    assert entry["campaignInfo"] == {"path": "/v2/campaign/c1"}
+    assert entry["forensicsInfo"]["path"].startswith("/v2/forensics")
+    assert enriched[2]["url"] == "u"
+    assert enriched[2]["threatInfo"] == entry["threatInfo"]
+    assert sorted(path.split("?")[0] for path in stub.paths) == [
+        "/v2/campaign/c1",
+        "/v2/forensics",
+        "/v2/forensics",
+        "/v2/threat/summary/t1",
+        "/v2/threat/summary/t2",
+    ]
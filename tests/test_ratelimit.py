@@ -0,0 +1,175 @@
+import asyncio
+import os
+import threading
+
+import pytest
+
+from pyproofpoint.proofpoint import ProofPoint
+from pyproofpoint.ratelimit import AdaptiveConcurrency, RateLimiter
+
+
+def test_waiting_tasks_are_served_in_arrival_order():
+    limit = AdaptiveConcurrency(1)
+    order = []
+
+    async def worker(name):
+        await limit.acquire_async()
+        order.append(name)
+        await asyncio.sleep(0)
+        limit.release()
+
+    async def main():
+        await limit.acquire_async()
+        tasks = [asyncio.ensure_future(worker(i)) for i in range(5)]
+        await asyncio.sleep(0.01)
+        limit.release()
+        await asyncio.gather(*tasks)
+
+    asyncio.run(main())
+    assert order == [0, 1, 2, 3, 4]
+    assert limit.in_flight == 0
+
+
+def test_cancelled_waiter_gives_up_its_place():
+    limit = AdaptiveConcurrency(1)
+
+    async def main():
+        await limit.acquire_async()
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(limit.acquire_async(), 0.01)
+        limit.release()
+        await asyncio.wait_for(limit.acquire_async(), 1)
+
+    asyncio.run(main())
+    assert limit.in_flight == 1
+    assert not limit._waiters
+
+
+def test_release_wakes_a_blocked_thread():
+    limit = AdaptiveConcurrency(1)
+    limit.acquire()
+    acquired = threading.Event()
+
+    def wait():
+        limit.acquire()
+        acquired.set()
+
+    thread = threading.Thread(target=wait)
+    thread.start()
+    assert not acquired.wait(0.05)
+    limit.release()
+    assert acquired.wait(1)
+    thread.join()
+    assert limit.in_flight == 1
+
+
+def test_cancelled_bucket_wait_leaves_the_limit_unchanged():
+    limiter = RateLimiter({"threat": (1, 10, 1)}, max_concurrency=2)
+
+    async def main():
+        await limiter.acquire_async("threat")
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(limiter.acquire_async("threat"), 0.01)
+
+    asyncio.run(main())
+    limit = limiter.concurrency_limit("threat")
+    assert limit.in_flight == 1
+    assert limit.limit == 2
+
+
+def test_async_timeouts_release_their_slots(stub):
+    aio = pytest.importorskip("pyproofpoint.aio")
+    limiter = RateLimiter(max_concurrency=2)
+    pp = aio.AsyncProofPoint("principal", "secret", rate_limiter=limiter)
+    pp.base_url = stub.url
+
+    async def main():
+        try:
+            stub.delay = 0.2
+            for threat_id in ("a", "b"):
+                with pytest.raises(asyncio.TimeoutError):
+                    await asyncio.wait_for(pp.get_threat_info(threat_id), 0.05)
+            stub.delay = 0
+            return await asyncio.wait_for(pp.get_threat_info("c"), 5)
+        finally:
+            await pp.close()
+
+    assert asyncio.run(main()) == {"path": "/v2/threat/summary/c"}
+    assert limiter.concurrency_limit("threat").in_flight == 0
+
+
+def test_sync_errors_release_their_slots(stub, monkeypatch):
+    limiter = RateLimiter(max_concurrency=1)
+    pp = ProofPoint("principal", "secret", rate_limiter=limiter)
+    pp.base_url = stub.url
+
+    def interrupted(*args, **kwargs):
+        raise KeyboardInterrupt
+
+    with monkeypatch.context() as patch:
+        patch.setattr(pp.session, "get", interrupted)
+        with pytest.raises(KeyboardInterrupt):
+            pp.get_threat_info("a")
+    assert limiter.concurrency_limit("threat").in_flight == 0
+    assert pp.get_threat_info("b") == {"path": "/v2/threat/summary/b"}
+    pp.close()
+
+
+def test_failures_do_not_grow_the_limit():
+    limiter = RateLimiter(max_concurrency=4)
+    limit = limiter.concurrency_limit("siem")
+    limit.limit = 2.0
+    for status in (None, 500, 503):
+        limiter.acquire("siem")
+        limiter.release("siem", status)
+    assert limit.limit == 2.0
+    limiter.acquire("siem")
+    limiter.release("siem", 200)
+    assert limit.limit == 2.5
+
+
+def siem_body(count):
+    events = ",".join(f'{{"GUID": "{i}"}}' for i in range(count))
+    return f'{{"queryEndTime": "2020-05-01T13:00:00Z", "clicksBlocked": [{events}]}}'.encode()
+
+
+def test_sync_stream_holds_its_slot_until_closed(stub):
+    limiter = RateLimiter(max_concurrency=1)
+    limit = limiter.concurrency_limit("siem")
+    stub.responses.extend([(200, siem_body(3), {}), (200, siem_body(3), {})])
+    with ProofPoint("principal", "secret", rate_limiter=limiter) as pp:
+        pp.base_url = stub.url
+        events = pp.get_all_events(sinceSeconds=60, dataformat="JSON", stream=True)
+        assert limit.in_flight == 1
+        assert len(list(events)) == 3
+        assert limit.in_flight == 0
+        events = pp.get_all_events(sinceSeconds=60, dataformat="JSON", stream=True)
+        events.close()
+        assert limit.in_flight == 0
+        with open(os.devnull, "wb") as sink:
+            pp.get_all_events(sinceSeconds=60, dataformat="JSON", sink=sink)
+        assert limit.in_flight == 0
+
+
+def test_async_stream_holds_its_slot_while_reading(stub):
+    aio = pytest.importorskip("pyproofpoint.aio")
+    limiter = RateLimiter(max_concurrency=1)
+    limit = limiter.concurrency_limit("siem")
+    stub.responses.append((200, siem_body(3), {}))
+    pp = aio.AsyncProofPoint("principal", "secret", rate_limiter=limiter)
+    pp.base_url = stub.url
+
+    async def main():
+        try:
+            events = await pp.get_all_events(
+                sinceSeconds=60, dataformat="JSON", stream=True
+            )
+            held = []
+            async for _ in events:
+                held.append(limit.in_flight)
+            return held
+        finally:
+            await pp.close()
+
+    assert asyncio.run(main()) == [1, 1, 1]
+    assert limit.in_flight == 0
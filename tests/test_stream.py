@@ -0,0 +1,96 @@
+import json
+
+import pytest
+
+from pyproofpoint.proofpoint import ProofPoint
+from pyproofpoint.stream import SIEMEventParser, SyslogLineParser, parse_stream
+
+RESPONSE = {
+    "queryEndTime": "2020-05-01T13:00:00Z",
+    "count": 12.5e1,
+    "messagesDelivered": [
+        {"GUID": "m1", "subject": 'Quote "\\ é€\U0001f600', "size": -1.25e-3},
+        {"GUID": "m2", "subject": "日本", "parts": [1, 2.5, None]},
+    ],
+    "messagesBlocked": [],
+    "clicksPermitted": [{"GUID": "c1", "ok": True}],
+    "clicksBlocked": [{"GUID": "c2", "ok": False}],
+    "truncated": False,
+}
+EVENTS = [
+    (key, event)
+    for key in (
+        "messagesDelivered",
+        "messagesBlocked",
+        "clicksPermitted",
+        "clicksBlocked",
+    )
+    for event in RESPONSE[key]
+]
+
+
+def parse(body, chunk_size):
+    parser = SIEMEventParser()
+    chunks = [body[i : i + chunk_size] for i in range(0, len(body), chunk_size)]
+    return list(parse_stream(chunks, "json", parser)), parser.values
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 7, 4096])
+@pytest.mark.parametrize("indent", [None, 2])
+def test_events_survive_any_chunk_boundary(chunk_size, indent):
+    body = json.dumps(RESPONSE, indent=indent, ensure_ascii=False).encode()
+    events, values = parse(body, chunk_size)
+    assert events == EVENTS
+    assert values == {
+        "queryEndTime": "2020-05-01T13:00:00Z",
+        "count": 125.0,
+        "truncated": False,
+    }
+
+
+def test_numbers_split_before_their_fraction_or_exponent():
+    body = b'{"a": 1.5e+3, "b": -20, "messagesDelivered": [{"GUID": "m1"}]}'
+    for split in range(1, len(body)):
+        parser = SIEMEventParser()
+        events = parser.feed(body[:split]) + parser.feed(body[split:])
+        events += parser.close()
+        assert events == [("messagesDelivered", {"GUID": "m1"})]
+        assert parser.values == {"a": 1500.0, "b": -20}
+
+
+@pytest.mark.parametrize(
+    "body", [b"", b"{", b'{"messagesDelivered": [{"GUID": "m1"}', b'{"a": 1']
+)
+def test_truncated_bodies_raise(body):
+    with pytest.raises(ValueError):
+        list(parse_stream([body], "json"))
+
+
+def test_non_object_body_raises():
+    with pytest.raises(ValueError):
+        list(parse_stream([b"[]"], "json"))
+
+
+def test_syslog_lines_split_across_chunks_and_crlf():
+    body = "m1 type=messagesDelivered {\"s\": \"é\"}\r\n\r\nm2 type=clicksBlocked {}\r\nm3".encode()
+    for size in (1, 5, len(body)):
+        parser = SyslogLineParser()
+        lines = []
+        for i in range(0, len(body), size):
+            lines.extend(parser.feed(body[i : i + size]))
+        lines.extend(parser.close())
+        assert lines == [
+            'm1 type=messagesDelivered {"s": "é"}',
+            "m2 type=clicksBlocked {}",
+            "m3",
+        ]
+
+
+def test_streamed_response_exposes_query_end_time(stub):
+    stub.responses.append((200, json.dumps(RESPONSE).encode(), {}))
+    pp = ProofPoint("principal", "secret")
+    pp.base_url = stub.url
+    events = pp.get_all_events(sinceSeconds=3600, dataformat="JSON", stream=True)
+    assert list(events) == EVENTS
+    assert events.values["queryEndTime"] == "2020-05-01T13:00:00Z"
+    pp.close()